@@ -1,5 +1,416 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Parsing configuration
+CSV_BLOCK_SIZE = 64 * 1024 * 1024  # bytes per pyarrow read block
+CSV_CHUNK_ROWS = 500_000  # rows per chunk for the pandas fallback parser
+CATEGORY_MAX_RATIO = 0.5  # string columns with at most this share of unique values become categoricals
+
+# Windowed viewer configuration: only the visible page of rows is sent to
+# the browser, and columns with more distinct values than TOP_K_VALUES get
+# a searchable list of the most frequent values instead of every value
+WINDOW_PAGE_SIZES = [50, 100, 500, 1000]
+TOP_K_VALUES = 1000
+FILE_ORDER = "(file order)"
+
+# On-disk dataset cache: parsed uploads stored as Arrow IPC files, named by
+# content hash and memory-mapped on load, so every session and server
+# process opening the same extract shares one physical copy
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "csv_viewer_cache"))
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+DATASET_CACHE_SUFFIXES = (".arrow", ".parquet")
+
+# DuckDB engine configuration; queries spill to DATASET_CACHE_DIR past the memory limit
+PANDAS_ENGINE = "pandas (in memory)"
+DUCKDB_ENGINE = "DuckDB (larger than memory)"
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "2GB")
+DUCKDB_BATCH_ROWS = 10_000
+DUCKDB_VALUE_CHOICES = 200  # most frequent values offered for text column filters
+DUCKDB_NUMERIC_TYPES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT",
+    "FLOAT", "REAL", "DOUBLE", "DECIMAL",
+)
+
+# Hash an upload once; Streamlit keeps the same file_id across reruns
+def file_content_hash(uploaded_file):
+    hashes = st.session_state.setdefault("file_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        digest = hashlib.blake2b(digest_size=20)
+        uploaded_file.seek(0)
+        for block in iter(lambda: uploaded_file.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+        uploaded_file.seek(0)
+        hashes[uploaded_file.file_id] = digest.hexdigest()
+    return hashes[uploaded_file.file_id]
+
+# Dictionary-encode low-cardinality string columns while still in Arrow,
+# so they arrive in pandas as categoricals without building Python strings
+def compact_arrow_table(table):
+    columns = []
+    for column in table.columns:
+        if (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)) and len(column):
+            if pc.count_distinct(column).as_py() <= CATEGORY_MAX_RATIO * len(column):
+                column = column.dictionary_encode()
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+# Convert low-cardinality object columns to categoricals (pandas fallback)
+def compact_object_columns(df):
+    for name in df.columns:
+        if df[name].dtype == object and len(df) and df[name].nunique() <= CATEGORY_MAX_RATIO * len(df):
+            df[name] = df[name].astype("category")
+    return df
+
+# Downcast numeric columns to the smallest dtype that holds every value
+def downcast_numeric_columns(df):
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_bool_dtype(column) or not pd.api.types.is_numeric_dtype(column):
+            continue
+        if pd.api.types.is_integer_dtype(column):
+            df[name] = pd.to_numeric(column, downcast="integer")
+        elif pd.api.types.is_float_dtype(column):
+            downcast = pd.to_numeric(column, downcast="float")
+            # Only keep float32 when no value changes
+            if downcast.dtype != column.dtype and (downcast.astype(column.dtype) == column).where(column.notna(), True).all():
+                df[name] = downcast
+    return df
+
+def read_csv_arrow(uploaded_file):
+    # Empty and NA-like strings become nulls, as pandas.read_csv reads them
+    reader = pa_csv.open_csv(
+        uploaded_file,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, quoted_strings_can_be_null=True),
+    )
+    table = compact_arrow_table(pa.Table.from_batches(list(reader), schema=reader.schema))
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def read_csv_pandas(uploaded_file):
+    chunks = [
+        downcast_numeric_columns(chunk)
+        for chunk in pd.read_csv(uploaded_file, chunksize=CSV_CHUNK_ROWS)
+    ]
+    return compact_object_columns(pd.concat(chunks, ignore_index=True))
+
+def parse_csv(uploaded_file):
+    uploaded_file.seek(0)
+    if pa is not None:
+        try:
+            return downcast_numeric_columns(read_csv_arrow(uploaded_file))
+        except pa.ArrowInvalid:
+            # Column types inferred from the first block did not hold later on
+            uploaded_file.seek(0)
+    return downcast_numeric_columns(read_csv_pandas(uploaded_file))
+
+def dataset_cache_path(content_hash):
+    return os.path.join(DATASET_CACHE_DIR, f"{content_hash}.arrow")
+
+# Drop least recently used datasets until the cache fits its size budget
+def evict_dataset_cache(keep=None):
+    entries = []
+    for name in os.listdir(DATASET_CACHE_DIR):
+        if name.endswith(DATASET_CACHE_SUFFIXES):
+            path = os.path.join(DATASET_CACHE_DIR, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= DATASET_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            # Open memory maps stay valid after the file is unlinked
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+def write_dataset_cache(content_hash, df):
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    path = dataset_cache_path(content_hash)
+    # Write then rename so concurrent readers never map a partial file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    try:
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, path)
+    finally:
+        # Eviction only counts finished files, so a failed write must not
+        # leave its partial file behind
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    evict_dataset_cache(keep=path)
+
+def read_dataset_cache(path):
+    # Touch the file so eviction sees it as recently used
+    os.utime(path)
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # split_blocks lets null-free numeric columns stay zero-copy views of the map
+    return table.to_pandas(split_blocks=True)
+
+# Load each distinct file once per process, from the disk cache when
+# another session or process has already parsed it. cache_resource hands
+# every session the same frame without copying it, so the viewer must
+# treat it as read-only.
+@st.cache_resource(max_entries=8, show_spinner="Loading CSV...")
+def load_csv(content_hash, _uploaded_file):
+    if pa is None:
+        return parse_csv(_uploaded_file)
+
+    path = dataset_cache_path(content_hash)
+    if not os.path.exists(path):
+        df = parse_csv(_uploaded_file)
+        try:
+            write_dataset_cache(content_hash, df)
+        except (OSError, pa.ArrowException):
+            # Disk cache unavailable; fall back to the private in-memory frame
+            return df
+    try:
+        return read_dataset_cache(path)
+    except FileNotFoundError:
+        # Evicted by another process in the meantime
+        return parse_csv(_uploaded_file)
+
+# Map each value of a column to its row positions. Built on first use of a
+# column and shared across reruns, so filtering is a positional take
+# proportional to the match count and the option list is already built.
+@st.cache_resource(max_entries=64)
+def column_value_index(content_hash, column, _df):
+    positions = _df.groupby(column, sort=False, observed=True).indices
+    return {
+        "values": list(positions),
+        "positions": positions,
+        "by_frequency": sorted(positions, key=lambda value: len(positions[value]), reverse=True),
+    }
+
+# Most frequent values of a column matching a search string
+@st.cache_data(max_entries=256)
+def search_column_values(content_hash, column, search, _value_index):
+    needle = search.lower()
+    matches = []
+    for value in _value_index["by_frequency"]:
+        if needle in str(value).lower():
+            matches.append(value)
+            if len(matches) == TOP_K_VALUES:
+                break
+    return matches
+
+# Sort order of a column, computed once per (column, direction). "order"
+# lists row positions in sorted order and "rank" gives each row's place in
+# it, so a filtered subset can be sorted in time proportional to its size.
+@st.cache_resource(max_entries=16)
+def column_sort_order(content_hash, column, ascending, _df):
+    values = _df[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Dictionary-encoded categories keep first-seen order; sort by value
+        values = values.cat.set_categories(sorted(values.cat.categories))
+    order = values.reset_index(drop=True).sort_values(
+        ascending=ascending, kind="stable", na_position="last"
+    ).index.to_numpy()
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return {"order": order, "rank": rank}
+
+# Render one page of rows, with server-side sorting and paging
+def render_window(df, positions, key, content_hash):
+    total = len(df) if positions is None else len(positions)
+    
+    sort_col, order_col, size_col = st.columns(3)
+    sort_by = sort_col.selectbox("Sort by", [FILE_ORDER] + list(df.columns), key=f"{key}_sort")
+    descending = order_col.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Descending"
+    page_size = size_col.selectbox("Rows per page", WINDOW_PAGE_SIZES, index=1, key=f"{key}_page_size")
+    
+    pages = max(1, -(-total // page_size))
+    # Keyed on the row count and page size so a stale page number resets
+    page = st.number_input(
+        f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1,
+        key=f"{key}_page_{total}_{page_size}"
+    )
+    start = (page - 1) * page_size
+    stop = min(start + page_size, total)
+    
+    if sort_by == FILE_ORDER:
+        window = np.arange(start, stop) if positions is None else positions[start:stop]
+    else:
+        ordering = column_sort_order(content_hash, sort_by, not descending, df)
+        if positions is None:
+            window = ordering["order"][start:stop]
+        else:
+            window = positions[np.argsort(ordering["rank"][positions], kind="stable")][start:stop]
+    
+    st.caption(f"Rows {start + 1:,}–{stop:,} of {total:,}" if total else "No rows")
+    st.dataframe(df.take(window))
+
+# DuckDB engine. The upload is converted once into a content-addressed
+# Parquet file in the dataset cache; filters and aggregations then run as
+# pushed-down DuckDB queries and only the (limited) result reaches pandas.
+@st.cache_resource
+def get_duckdb():
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = '{DUCKDB_MEMORY_LIMIT}'")
+    con.execute(f"SET temp_directory = '{sql_string(DATASET_CACHE_DIR)}'")
+    return con
+
+def sql_string(value):
+    return value.replace("'", "''")
+
+def sql_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+# One conversion per file per process; the Parquet file is shared with
+# other processes through the dataset cache directory
+@st.cache_resource(show_spinner="Converting CSV for DuckDB...")
+def build_duckdb_dataset(content_hash, _uploaded_file):
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    path = os.path.join(DATASET_CACHE_DIR, f"{content_hash}.parquet")
+    if os.path.exists(path):
+        return path
+
+    # Stream the upload to disk, then let DuckDB convert it without pandas
+    unique = f"{os.getpid()}.{threading.get_ident()}"
+    csv_path = f"{path}.{unique}.csv"
+    temp_path = f"{path}.{unique}.tmp"
+    _uploaded_file.seek(0)
+    with open(csv_path, "wb") as f:
+        shutil.copyfileobj(_uploaded_file, f, 8 * 1024 * 1024)
+    try:
+        get_duckdb().cursor().execute(
+            f"COPY (SELECT * FROM read_csv_auto('{sql_string(csv_path)}')) "
+            f"TO '{sql_string(temp_path)}' (FORMAT PARQUET)"
+        )
+        os.replace(temp_path, path)
+    finally:
+        for leftover in (csv_path, temp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    evict_dataset_cache(keep=path)
+    return path
+
+# The cached path can outlive its file once eviction removes it, so check
+# the file on every call and convert again if it is gone
+def prepare_duckdb_dataset(content_hash, uploaded_file):
+    path = build_duckdb_dataset(content_hash, uploaded_file)
+    if not os.path.exists(path):
+        build_duckdb_dataset.clear(content_hash, uploaded_file)
+        path = build_duckdb_dataset(content_hash, uploaded_file)
+    # Touch the file so eviction sees it as recently used
+    os.utime(path)
+    return path
+
+def duckdb_source(path):
+    return f"read_parquet('{sql_string(path)}')"
+
+@st.cache_data
+def duckdb_schema(path):
+    rows = get_duckdb().cursor().execute(f"DESCRIBE SELECT * FROM {duckdb_source(path)}").fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+@st.cache_data
+def duckdb_column_range(path, column):
+    return get_duckdb().cursor().execute(
+        f"SELECT MIN({sql_identifier(column)}), MAX({sql_identifier(column)}) FROM {duckdb_source(path)}"
+    ).fetchone()
+
+@st.cache_data
+def duckdb_top_values(path, column):
+    rows = get_duckdb().cursor().execute(
+        f"SELECT {sql_identifier(column)} FROM {duckdb_source(path)} "
+        f"WHERE {sql_identifier(column)} IS NOT NULL "
+        f"GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT {DUCKDB_VALUE_CHOICES}"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+# Run a query and stream record batches until the row limit is reached
+@st.cache_data(show_spinner="Running query...")
+def run_duckdb_query(sql, params, row_limit):
+    cursor = get_duckdb().cursor()
+    started = time.perf_counter()
+    reader = cursor.execute(sql, params).fetch_record_batch(DUCKDB_BATCH_ROWS)
+    batches = []
+    rows = 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= row_limit:
+            break
+    table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, row_limit)
+    return table.to_pandas(), time.perf_counter() - started
+
+def duckdb_viewer(content_hash, uploaded_file):
+    path = prepare_duckdb_dataset(content_hash, uploaded_file)
+    schema = duckdb_schema(path)
+    columns = [name for name, _ in schema]
+    numeric_columns = [name for name, column_type in schema if column_type.startswith(DUCKDB_NUMERIC_TYPES)]
+
+    # Multi-column filters: ranges for numeric columns, value lists otherwise
+    predicates = []
+    params = []
+    for column in st.multiselect("Filter columns", columns):
+        if column in numeric_columns:
+            low, high = duckdb_column_range(path, column)
+            if low is None or low == high:
+                continue
+            selected_low, selected_high = st.slider(column, float(low), float(high), (float(low), float(high)))
+            predicates.append(f"{sql_identifier(column)} BETWEEN ? AND ?")
+            params.extend([selected_low, selected_high])
+        else:
+            selected = st.multiselect(f"{column} is one of", duckdb_top_values(path, column))
+            if selected:
+                predicates.append(f"{sql_identifier(column)} IN ({', '.join('?' for _ in selected)})")
+                params.extend(selected)
+    where = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+    # Optional group-by aggregation
+    group_by = st.multiselect("Group by", columns)
+    if group_by:
+        aggregate = st.selectbox("Aggregate", ["count", "sum", "avg", "min", "max"])
+        if aggregate == "count":
+            value = "COUNT(*)"
+        elif numeric_columns:
+            value = f"{aggregate.upper()}({sql_identifier(st.selectbox('Of column', numeric_columns))})"
+        else:
+            st.write("No numeric columns to aggregate; counting rows instead.")
+            value = "COUNT(*)"
+        keys = ", ".join(sql_identifier(column) for column in group_by)
+        alias = sql_identifier(aggregate)
+        sql = f"SELECT {keys}, {value} AS {alias} FROM {duckdb_source(path)}{where} GROUP BY {keys} ORDER BY {alias} DESC"
+    else:
+        sql = f"SELECT * FROM {duckdb_source(path)}{where}"
+
+    row_limit = st.number_input("Maximum rows to display", min_value=10, max_value=100_000, value=1_000, step=100)
+    result, seconds = run_duckdb_query(sql, params, int(row_limit))
+    st.write(f"{len(result):,} rows in {seconds * 1000:.0f} ms:")
+    st.dataframe(result)
 
 st.title("CSV Data Viewer")
 
@@ -7,20 +418,34 @@ st.title("CSV Data Viewer")
 uploaded_file = st.file_uploader("Upload a CSV file", type="csv")
 
 if uploaded_file is not None:
-    # Load CSV with pandas
-    df = pd.read_csv(uploaded_file)
-
-    # Show raw data with checkbox
-    if st.checkbox("Show raw data"):
-        st.dataframe(df)
-
-    # Selectbox to filter by a column (e.g., 'Category')
-    column_to_filter = st.selectbox("Select a column to filter", df.columns)
-
-    # If the column has many unique values, filter by them
-    if df[column_to_filter].nunique() > 0:
-        unique_values = df[column_to_filter].unique()
-        selected_value = st.selectbox(f"Filter by value in '{column_to_filter}'", unique_values)
-        filtered_df = df[df[column_to_filter] == selected_value]
-        st.write(f"Filtered data by {column_to_filter} = {selected_value}:")
-        st.dataframe(filtered_df)
+    content_hash = file_content_hash(uploaded_file)
+
+    # DuckDB needs both duckdb and pyarrow; otherwise only pandas is offered
+    engines = [PANDAS_ENGINE, DUCKDB_ENGINE] if duckdb is not None and pa is not None else [PANDAS_ENGINE]
+    engine = st.radio("Query engine", engines, horizontal=True)
+
+    if engine == DUCKDB_ENGINE:
+        duckdb_viewer(content_hash, uploaded_file)
+    else:
+        # Load CSV, parsed once per distinct file content
+        df = load_csv(content_hash, uploaded_file)
+
+        # Show raw data with checkbox
+        if st.checkbox("Show raw data"):
+            render_window(df, None, "raw", content_hash)
+
+        # Selectbox to filter by a column (e.g., 'Category')
+        column_to_filter = st.selectbox("Select a column to filter", df.columns)
+
+        # If the column has many unique values, filter by them
+        value_index = column_value_index(content_hash, column_to_filter, df)
+        if len(value_index["values"]) > TOP_K_VALUES:
+            search = st.text_input(f"Search values in '{column_to_filter}'")
+            value_choices = search_column_values(content_hash, column_to_filter, search, value_index)
+            st.caption(f"Showing the {len(value_choices):,} most frequent matching values of {len(value_index['values']):,}.")
+        else:
+            value_choices = value_index["values"]
+        if len(value_choices) > 0:
+            selected_value = st.selectbox(f"Filter by value in '{column_to_filter}'", value_choices)
+            st.write(f"Filtered data by {column_to_filter} = {selected_value}:")
+            render_window(df, value_index["positions"][selected_value], "filtered", content_hash)
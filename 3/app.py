@@ -1,60 +1,174 @@
 import streamlit as st
+import bisect
+import json
+import math
+import os
+import re
+import textwrap
+from collections import Counter, defaultdict
+
+# Content store: one JSON file per topic, see content/*.json
+CONTENT_DIR = os.getenv(
+    "CONTENT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+)
+TEXT_BLOCKS = {"header", "subheader", "text", "markdown"}
+TITLE_WEIGHT = 3
+MAX_SEARCH_RESULTS = 50
+MAX_RADIO_TOPICS = 20
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+# Validates a topic's blocks and returns them render-ready, along with
+# their plain text for the search index
+def prepare_blocks(blocks, source):
+    prepared = []
+    texts = []
+    for block in blocks:
+        kind = block.get("type")
+        if kind in TEXT_BLOCKS:
+            text = textwrap.dedent(block["text"]).strip()
+            prepared.append((kind, text))
+            texts.append(text)
+        elif kind == "expander":
+            children, child_texts = prepare_blocks(block["blocks"], source)
+            prepared.append((kind, (block["title"], children)))
+            texts.extend([block["title"], *child_texts])
+        elif kind == "columns":
+            columns = []
+            for column in block["columns"]:
+                children, child_texts = prepare_blocks(column, source)
+                columns.append(children)
+                texts.extend(child_texts)
+            prepared.append((kind, columns))
+        else:
+            raise ValueError(f"{source}: unknown block type {kind!r}")
+    return prepared, texts
+
+def load_topic(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    try:
+        blocks, texts = prepare_blocks(data["blocks"], path)
+        return {
+            "title": data["title"],
+            "order": data.get("order", 0),
+            "tab": data["tab"],
+            "blocks": blocks,
+            "text": "\n".join(texts),
+        }
+    except KeyError as e:
+        raise ValueError(f"{path}: missing field {e}") from None
+
+# Inverted index: token -> {topic number: weighted term count}. Title words
+# count TITLE_WEIGHT times. The sorted vocabulary serves prefix lookups.
+def build_search_index(topics):
+    postings = defaultdict(dict)
+    for number, topic in enumerate(topics):
+        counts = Counter(tokenize(topic["text"]))
+        for token in tokenize(topic["title"]):
+            counts[token] += TITLE_WEIGHT
+        for token, count in counts.items():
+            postings[token][number] = count
+    return {"postings": dict(postings), "vocabulary": sorted(postings), "size": len(topics)}
+
+def prefix_matches(index, prefix):
+    vocabulary = index["vocabulary"]
+    start = bisect.bisect_left(vocabulary, prefix)
+    end = bisect.bisect_left(vocabulary, prefix + "\uffff")
+    return vocabulary[start:end]
+
+# Topic numbers matching every query word, best first (TF-IDF). The last
+# word also matches as a prefix, so results appear while typing.
+def search_topics(index, query):
+    words = tokenize(query)
+    if not words:
+        return []
+    scores = None
+    for position, word in enumerate(words):
+        tokens = prefix_matches(index, word) if position == len(words) - 1 else [word]
+        word_scores = Counter()
+        for token in tokens:
+            postings = index["postings"].get(token, {})
+            idf = math.log(1 + index["size"] / len(postings)) if postings else 0.0
+            for number, count in postings.items():
+                word_scores[number] += count * idf
+        if scores is None:
+            scores = word_scores
+        else:
+            scores = Counter({number: scores[number] + score for number, score in word_scores.items() if number in scores})
+        if not scores:
+            return []
+    return [number for number, _ in scores.most_common(MAX_SEARCH_RESULTS)]
+
+# Loaded, pre-rendered and indexed once per server process
+@st.cache_resource
+def load_content(content_dir=CONTENT_DIR):
+    paths = sorted(os.path.join(content_dir, name) for name in os.listdir(content_dir) if name.endswith(".json"))
+    topics = sorted((load_topic(path) for path in paths), key=lambda topic: (topic["order"], topic["title"]))
+    tabs = list(dict.fromkeys(topic["tab"] for topic in topics))
+    return {
+        "topics": topics,
+        "by_title": {topic["title"]: topic for topic in topics},
+        "tabs": tabs,
+        "index": build_search_index(topics),
+    }
+
+def render_blocks(blocks):
+    for kind, payload in blocks:
+        if kind == "header":
+            st.header(payload)
+        elif kind == "subheader":
+            st.subheader(payload)
+        elif kind == "text":
+            st.write(payload)
+        elif kind == "markdown":
+            st.markdown(payload)
+        elif kind == "expander":
+            title, children = payload
+            with st.expander(title):
+                render_blocks(children)
+        elif kind == "columns":
+            for column, children in zip(st.columns(len(payload)), payload):
+                with column:
+                    render_blocks(children)
+
+try:
+    content = load_content()
+except (OSError, ValueError) as e:
+    st.error(f"Could not load content from {CONTENT_DIR}: {e}")
+    st.stop()
+if not content["topics"]:
+    st.warning(f"No content found in {CONTENT_DIR}.")
+    st.stop()
 
 # Sidebar options
 st.sidebar.title("Navigation")
-topic = st.sidebar.radio("Select Topic", ["Overview", "Data Warehouse Architecture", "Enterprise Data Management"])
+query = st.sidebar.text_input("Search")
+titles = [topic["title"] for topic in content["topics"]]
+if query:
+    matches = [titles[number] for number in search_topics(content["index"], query)]
+    if matches:
+        st.sidebar.caption(f"{len(matches)} matching topic(s)")
+        titles = matches
+    else:
+        st.sidebar.caption("No matching topics")
+# A radio list stops being usable long before the content stops growing
+if len(titles) > MAX_RADIO_TOPICS:
+    topic = st.sidebar.selectbox("Select Topic", titles)
+else:
+    topic = st.sidebar.radio("Select Topic", titles)
 
 st.title("Data Warehousing & Enterprise Data Management")
 
-# Use tabs for major categories
-tab1, tab2 = st.tabs(["Core Concepts", "Advanced Topics"])
-
-# Overview Section
-if topic == "Overview":
-    with tab1:
-        st.header("Core Concepts")
-        with st.expander("What is Data Warehousing?"):
-            st.write("Data Warehousing is a system used for reporting and data analysis, acting as a central repository for integrated data.")
-        with st.expander("What is Enterprise Data Management?"):
-            st.write("Enterprise Data Management (EDM) is a framework that helps ensure high data quality and effective data governance.")
-
-# Data Warehouse Architecture Section
-elif topic == "Data Warehouse Architecture":
-    with tab1:
-        st.header("Data Warehouse Architecture")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader("Staging Area")
-            st.write("Temporarily holds raw data before processing.")
-        with col2:
-            st.subheader("Data Integration")
-            st.write("Combines data from multiple sources using ETL/ELT.")
-
-        with st.expander("More on Architecture"):
-            st.write("""
-            - **Data Sources**: Internal and external systems.
-            - **Staging Area**: Prepares data for integration.
-            - **Warehouse Layer**: Central storage.
-            - **Data Marts**: Subsets for specific departments.
-            """)
-
-# EDM Section
-elif topic == "Enterprise Data Management":
-    with tab2:
-        st.header("EDM Components")
-        st.write("Effective EDM consists of several pillars:")
-        with st.expander("Key Pillars of EDM"):
-            st.write("""
-            - Data Governance
-            - Master Data Management
-            - Data Stewardship
-            - Metadata Management
-            - Data Quality
-            """)
-
-        st.markdown("#### Why EDM Matters")
-        st.write("It ensures that data is accurate, secure, and accessible to the right users.")
+# Use tabs for major categories; only the selected topic is rendered, in
+# the tab its content file names
+tabs = dict(zip(content["tabs"], st.tabs(content["tabs"])))
+active = content["by_title"][topic]
+with tabs[active["tab"]]:
+    render_blocks(active["blocks"])
 
 # Footer info
 st.markdown("---")
@@ -1,53 +1,462 @@
 import streamlit as st
 import requests
 import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.express as px
-import seaborn as sns
-import altair as alt
-
-# Page setup
-st.title("COVID-19 Global Stats Dashboard")
-
-# API call
-url = "https://disease.sh/v3/covid-19/countries"
-response = requests.get(url)
-data = response.json()
-
-# Parse JSON to DataFrame
-df = pd.json_normalize(data)
-df = df[["country", "cases", "todayCases", "deaths", "recovered", "active", "critical"]]
-df = df.sort_values("cases", ascending=False).head(10)
-
-st.subheader("Top 10 Countries by Total Cases")
-st.dataframe(df)
-
-# 1. Matplotlib bar chart
-st.subheader("Bar Chart - Total Cases (Matplotlib)")
-fig, ax = plt.subplots()
-ax.bar(df["country"], df["cases"], color="orange")
-plt.xticks(rotation=45)
-st.pyplot(fig)
-
-# 2. Plotly bar chart
-st.subheader("Bar Chart - Active Cases (Plotly)")
-fig_plotly = px.bar(df, x="country", y="active", color="country", title="Active Cases")
-st.plotly_chart(fig_plotly)
-
-# 3. Seaborn heatmap
-st.subheader("Heatmap - Cases, Deaths, Recovered (Seaborn)")
-fig2, ax2 = plt.subplots()
-sns.heatmap(df[["cases", "deaths", "recovered"]], annot=True, fmt="d", cmap="Blues", ax=ax2)
-st.pyplot(fig2)
-
-# 4. Altair line chart
-st.subheader("Line Chart - Critical Cases (Altair)")
-line_chart = alt.Chart(df).mark_line(point=True).encode(
-    x="country", y="critical", color="country"
-).properties(title="Critical Cases")
-st.altair_chart(line_chart, use_container_width=True)
-
-# 5. Plotly pie chart
-st.subheader("Pie Chart - Today's Cases Distribution")
-fig_pie = px.pie(df, values='todayCases', names='country', title='Today\'s Cases Share')
-st.plotly_chart(fig_pie)
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# API configuration. COVID_API_BASE can point at a local stub server.
+COVID_API_BASE = os.getenv("COVID_API_BASE", "https://disease.sh/v3/covid-19")
+COUNTRIES_URL = f"{COVID_API_BASE}/countries"
+CACHE_TTL_SECONDS = int(os.getenv("COVID_CACHE_TTL_SECONDS", "600"))
+REQUEST_TIMEOUT = (3.05, 15)  # connect, read seconds
+HTTP_POOL_SIZE = 10
+SNAPSHOT_PATH = os.getenv(
+    "COVID_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "countries_snapshot.json")
+)
+STAT_COLUMNS = ["country", "cases", "todayCases", "deaths", "recovered", "active", "critical"]
+
+# Historical time series, kept locally in a Parquet file
+HISTORY_URL = f"{COVID_API_BASE}/historical"
+HISTORY_PATH = os.getenv(
+    "COVID_HISTORY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.parquet")
+)
+HISTORY_WORKERS = int(os.getenv("COVID_HISTORY_WORKERS", "16"))
+# Minimum gap between automatic ingestion attempts while nothing is stored
+HISTORY_AUTO_FETCH_SECONDS = int(os.getenv("COVID_HISTORY_AUTO_FETCH_SECONDS", "600"))
+HISTORY_METRICS = ["cases", "deaths", "recovered"]
+HISTORY_COLUMNS = ["country", "date"] + HISTORY_METRICS
+
+# Pooled HTTP session with retries on transient failures
+def create_http_session(pool_size=HTTP_POOL_SIZE, retries=3):
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"])
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_http_session():
+    return create_http_session()
+
+# Conditional GET; returns a new snapshot, or None when the server answers
+# 304 Not Modified for the validators we already hold
+def fetch_countries(session, url, etag=None, last_modified=None):
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return {
+        "data": response.json(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    }
+
+# Last good snapshot on disk, for cold starts without waiting on the API
+def save_snapshot(path, snapshot):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+def load_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# In-process snapshot shared by all sessions. Reruns read it immediately;
+# once it is older than the TTL a single background thread revalidates it.
+def new_countries_store(url=COUNTRIES_URL, snapshot_path=SNAPSHOT_PATH, ttl=CACHE_TTL_SECONDS):
+    return {
+        "lock": threading.Lock(),
+        "url": url,
+        "snapshot_path": snapshot_path,
+        "ttl": ttl,
+        "snapshot": None,
+        "frame": None,
+        "checked_at": 0.0,
+        "refreshing": False,
+        "error": None,
+    }
+
+@st.cache_resource
+def get_countries_store():
+    return new_countries_store()
+
+def apply_snapshot(store, snapshot, checked_at):
+    frame = pd.json_normalize(snapshot["data"])
+    with store["lock"]:
+        store["snapshot"] = snapshot
+        store["frame"] = frame
+        store["checked_at"] = checked_at
+
+def refresh_countries(store, session):
+    try:
+        current = store["snapshot"] or {}
+        snapshot = fetch_countries(session, store["url"], current.get("etag"), current.get("last_modified"))
+        if snapshot is None:
+            with store["lock"]:
+                store["checked_at"] = time.time()
+        else:
+            apply_snapshot(store, snapshot, time.time())
+            save_snapshot(store["snapshot_path"], snapshot)
+        store["error"] = None
+    except (requests.RequestException, ValueError, OSError) as e:
+        # Keep serving the last good snapshot
+        store["error"] = str(e)
+    finally:
+        with store["lock"]:
+            store["refreshing"] = False
+
+def start_background_refresh(store, session):
+    with store["lock"]:
+        if store["refreshing"]:
+            return False
+        store["refreshing"] = True
+    threading.Thread(target=refresh_countries, args=(store, session), daemon=True).start()
+    return True
+
+# Countries frame for this rerun, never waiting on the API once any
+# snapshot (in memory or on disk) exists
+def get_countries(store, session):
+    if store["frame"] is None:
+        snapshot = load_snapshot(store["snapshot_path"])
+        if snapshot is not None:
+            apply_snapshot(store, snapshot, snapshot.get("fetched_at", 0.0))
+    
+    if store["frame"] is None:
+        # First run with no snapshot anywhere: one blocking fetch
+        with store["lock"]:
+            store["refreshing"] = True
+        refresh_countries(store, session)
+    elif time.time() - store["checked_at"] > store["ttl"]:
+        start_background_refresh(store, session)
+    
+    return store["frame"]
+
+# Long-format history frame: one row per (country, date)
+def empty_history():
+    return pd.DataFrame({
+        "country": pd.Series(dtype="category"),
+        "date": pd.Series(dtype="datetime64[ns]"),
+        **{metric: pd.Series(dtype="int64") for metric in HISTORY_METRICS},
+    })
+
+def timeline_frame(country, payload):
+    timeline = payload.get("timeline", {})
+    series = {metric: pd.Series(timeline.get(metric) or {}, dtype="float64") for metric in HISTORY_METRICS}
+    frame = pd.DataFrame(series).dropna(how="all")
+    if frame.empty:
+        return empty_history()
+    frame.index = pd.to_datetime(frame.index, format="%m/%d/%y")
+    frame = frame.fillna(0).astype("int64").rename_axis("date").reset_index()
+    frame.insert(0, "country", country)
+    return frame[HISTORY_COLUMNS]
+
+# One country's series for the last `lastdays` days ("all" for everything).
+# The API accepts an ISO3 code or a name; rows are stored under `country`,
+# the display name from the countries frame. 404 means no history exists.
+def fetch_country_history(session, country, key, lastdays, base_url=HISTORY_URL):
+    response = session.get(
+        f"{base_url}/{quote(key, safe='')}",
+        params={"lastdays": lastdays},
+        timeout=REQUEST_TIMEOUT
+    )
+    if response.status_code == 404:
+        return empty_history()
+    response.raise_for_status()
+    return timeline_frame(country, response.json())
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return empty_history()
+    return pd.read_parquet(path)
+
+def save_history(history, path=HISTORY_PATH):
+    history = history.astype({"country": "category"})
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    history.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+
+# Days to request so the response overlaps the last stored day; countries
+# not stored yet get their whole series
+def days_to_fetch(last_dates, country, today):
+    last_date = last_dates.get(country)
+    if last_date is None:
+        return "all"
+    return max(1, (today - last_date).days + 1)
+
+def merge_history(history, new_rows):
+    frames = [frame for frame in [history, *new_rows] if not frame.empty]
+    if not frames:
+        return empty_history()
+    merged = pd.concat([frame.astype({"country": "object"}) for frame in frames], ignore_index=True)
+    # Later fetches win: the API revises recent days
+    merged = merged.drop_duplicates(["country", "date"], keep="last")
+    merged = merged.sort_values(["country", "date"], ignore_index=True)
+    return merged.astype({"country": "category"})
+
+# Fetch every country's new days concurrently over the pooled session
+# (which retries transient failures), merge them into the stored history
+# and rewrite the file once. Failed countries keep their stored rows.
+def ingest_history(session, countries, path=HISTORY_PATH, base_url=HISTORY_URL, workers=HISTORY_WORKERS):
+    started = time.time()
+    history = load_history(path)
+    last_dates = history.groupby("country", observed=True)["date"].max().to_dict()
+    today = pd.Timestamp(datetime.now(timezone.utc).date())
+
+    new_rows = []
+    failed = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_country_history, session, country, key,
+                days_to_fetch(last_dates, country, today), base_url
+            ): country
+            for country, key in countries
+        }
+        for future in as_completed(futures):
+            try:
+                new_rows.append(future.result())
+            except (requests.RequestException, ValueError) as e:
+                failed[futures[future]] = str(e)
+
+    merged = merge_history(history, new_rows)
+    rows_added = len(merged) - len(history)
+    if any(not frame.empty for frame in new_rows):
+        save_history(merged, path)
+    return {
+        "countries": len(futures),
+        "rows_added": rows_added,
+        "failed": failed,
+        "seconds": time.time() - started,
+    }
+
+# (display name, API key) pairs; ISO3 codes avoid ambiguous names
+def history_keys(countries):
+    iso3 = countries.get("countryInfo.iso3", pd.Series(index=countries.index, dtype="object"))
+    keys = iso3.where(iso3.notna(), countries["country"])
+    return list(zip(countries["country"], keys))
+
+@st.cache_resource
+def get_history_session():
+    return create_http_session(pool_size=HISTORY_WORKERS)
+
+# Serializes ingestion across sessions of this server process and
+# remembers when it was last attempted
+@st.cache_resource
+def get_history_state():
+    return {"lock": threading.Lock(), "last_attempt": None}
+
+# Stored history, re-read only when the file changes
+@st.cache_data(max_entries=2)
+def read_history(path, mtime):
+    return load_history(path)
+
+def get_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return empty_history()
+    return read_history(path, os.path.getmtime(path))
+
+# Chart builders. Each plotting library is imported inside the builder
+# that uses it, so a fresh server process only pays for the backends of
+# the charts actually viewed (see bench_startup.py). Matplotlib/seaborn
+# charts render straight to PNG bytes and close their figure before
+# returning, so nothing accumulates in pyplot's figure registry on a
+# long-running server.
+def load_pyplot():
+    import matplotlib
+    # Non-interactive backend: figures only ever render to images
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def render_figure_png(draw):
+    plt = load_pyplot()
+    fig, ax = plt.subplots()
+    try:
+        draw(fig, ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def cases_bar_chart(df):
+    def draw(fig, ax):
+        ax.bar(df["country"], df["cases"], color="orange")
+        ax.tick_params(axis="x", labelrotation=45)
+    return render_figure_png(draw)
+
+def active_bar_chart(df):
+    import plotly.express as px
+    return px.bar(df, x="country", y="active", color="country", title="Active Cases")
+
+def outcomes_heatmap(df):
+    import seaborn as sns
+
+    def draw(fig, ax):
+        sns.heatmap(df[["cases", "deaths", "recovered"]], annot=True, fmt="d", cmap="Blues", ax=ax)
+    return render_figure_png(draw)
+
+def critical_line_chart(df):
+    import altair as alt
+    return alt.Chart(df).mark_line(point=True).encode(
+        x="country", y="critical", color="country"
+    ).properties(title="Critical Cases")
+
+def today_cases_pie(df):
+    import plotly.express as px
+    return px.pie(df, values='todayCases', names='country', title='Today\'s Cases Share')
+
+# Chart title -> (output kind, builder)
+CHARTS = {
+    "Bar Chart - Total Cases (Matplotlib)": ("image", cases_bar_chart),
+    "Bar Chart - Active Cases (Plotly)": ("plotly", active_bar_chart),
+    "Heatmap - Cases, Deaths, Recovered (Seaborn)": ("image", outcomes_heatmap),
+    "Line Chart - Critical Cases (Altair)": ("altair", critical_line_chart),
+    "Pie Chart - Today's Cases Distribution": ("plotly", today_cases_pie),
+}
+
+# Content hash of a frame, including its columns and index
+def frame_key(df):
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(repr(list(df.columns)).encode())
+    return digest.hexdigest()
+
+# Rendered charts keyed on (chart spec, data hash); a rerun with unchanged
+# data reuses the rendered output instead of rebuilding it
+@st.cache_data(max_entries=64)
+def render_chart(title, data_key, _df):
+    builder = CHARTS[title][1]
+    return builder(_df)
+
+def show_chart(title, df):
+    kind, _ = CHARTS[title]
+    chart = render_chart(title, frame_key(df), df)
+    if kind == "image":
+        st.image(chart)
+    elif kind == "plotly":
+        st.plotly_chart(chart)
+    else:
+        st.altair_chart(chart, use_container_width=True)
+
+def update_history(countries):
+    state = get_history_state()
+    lock = state["lock"]
+    if not lock.acquire(blocking=False):
+        st.info("History is already being updated by another session.")
+        return
+    try:
+        state["last_attempt"] = time.time()
+        with st.spinner("Fetching historical data..."):
+            summary = ingest_history(get_history_session(), history_keys(countries))
+    finally:
+        lock.release()
+
+    st.sidebar.caption(
+        f"Updated {summary['countries']} countries in {summary['seconds']:.1f}s, "
+        f"{summary['rows_added']} new rows"
+    )
+    if summary["failed"]:
+        st.sidebar.warning(f"{len(summary['failed'])} countries failed; their stored history was kept.")
+
+def snapshot_view(countries):
+    df = countries[STAT_COLUMNS]
+    df = df.sort_values("cases", ascending=False).head(10)
+
+    st.subheader("Top 10 Countries by Total Cases")
+    st.dataframe(df)
+
+    # Charts render lazily: only the selected one is built (or fetched from
+    # the chart cache) on each rerun
+    chart_title = st.radio("Chart", list(CHARTS), horizontal=True)
+    st.subheader(chart_title)
+    show_chart(chart_title, df)
+
+# Without a store yet, ingestion starts on its own, but at most once per
+# HISTORY_AUTO_FETCH_SECONDS so reruns do not refetch after a failure
+def should_auto_fetch_history(path=HISTORY_PATH):
+    if os.path.exists(path):
+        return False
+    last_attempt = get_history_state()["last_attempt"]
+    return last_attempt is None or time.time() - last_attempt >= HISTORY_AUTO_FETCH_SECONDS
+
+# Trend charts read only the local Parquet store; the API is contacted
+# when the store is empty or the user asks for an update
+def historical_view(countries):
+    try:
+        if st.sidebar.button("Update history") or should_auto_fetch_history():
+            update_history(countries)
+        history = get_history()
+    except ImportError as e:
+        st.error(f"Historical mode needs a Parquet engine (pyarrow): {e}")
+        st.stop()
+    if history.empty:
+        st.warning("No historical data stored yet.")
+        st.stop()
+
+    top = countries.sort_values("cases", ascending=False)["country"].head(5)
+    available = list(history["country"].cat.categories)
+    selected = st.multiselect("Countries", available, default=[c for c in top if c in available])
+    metric = st.selectbox("Metric", HISTORY_METRICS)
+    daily = st.checkbox("Daily new")
+
+    if not selected:
+        st.info("Select at least one country.")
+        return
+    rows = history[history["country"].isin(selected)]
+    trend = rows.pivot_table(index="date", columns="country", values=metric, observed=True)
+    if daily:
+        trend = trend.diff().clip(lower=0)
+
+    st.subheader(f"{'Daily new' if daily else 'Cumulative'} {metric}")
+    st.line_chart(trend)
+    st.caption(f"{len(history)} rows stored through {history['date'].max():%Y-%m-%d}")
+
+def main():
+    # Page setup
+    st.title("COVID-19 Global Stats Dashboard")
+    mode = st.sidebar.radio("Mode", ["Snapshot", "Historical"])
+
+    # API data, served from the shared snapshot
+    store = get_countries_store()
+    countries = get_countries(store, get_http_session())
+    if countries is None:
+        st.error(f"Could not load data from {store['url']}: {store['error']}")
+        st.stop()
+    if store["error"]:
+        st.caption(f"Showing the last good snapshot; refresh failed: {store['error']}")
+
+    if mode == "Snapshot":
+        snapshot_view(countries)
+    else:
+        historical_view(countries)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Cold-start benchmark for the COVID-19 dashboard.
+
+Every measurement runs in a fresh Python process, the way a new server
+replica starts. It times the import of app.py itself (Streamlit, pandas and
+requests only, since the plotting libraries are imported lazily) and then,
+for each plotting backend, the import of that library plus the first and a
+second render of its chart on a dashboard-sized frame. It also lists any
+plotting library that app.py itself pulled in at import time (beyond what
+Streamlit loads on its own), which would be a regression.
+
+    python 4/bench_startup.py
+    python 4/bench_startup.py --repeat 5 --max-cold-start-ms 4000 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PLOTTING_MODULES = ["matplotlib", "matplotlib.pyplot", "plotly", "plotly.express", "seaborn", "altair"]
+
+# Backend -> (module to import, app.py builder, how Streamlit serialises it)
+BACKENDS = {
+    "matplotlib": ("matplotlib.pyplot", "cases_bar_chart", "png"),
+    "plotly": ("plotly.express", "active_bar_chart", "plotly"),
+    "seaborn": ("seaborn", "outcomes_heatmap", "png"),
+    "altair": ("altair", "critical_line_chart", "vega"),
+}
+
+# Runs inside the child process; prints one JSON object on stdout
+PROBE = r"""
+import importlib, json, sys, time
+
+app_dir, backend_module, builder_name, output = sys.argv[1:5]
+plotting_modules = json.loads(sys.argv[5])
+sys.path.insert(0, app_dir)
+
+started = time.perf_counter()
+import streamlit
+# Streamlit may load some plotting packages itself; only flag what app.py adds
+preloaded = set(sys.modules)
+import app
+app_import = time.perf_counter() - started
+eager = [name for name in plotting_modules if name in sys.modules and name not in preloaded]
+
+import pandas as pd
+df = pd.DataFrame({
+    "country": [f"Country {i}" for i in range(10)],
+    "cases": [1000000 - i * 50000 for i in range(10)],
+    "deaths": [20000 - i * 1000 for i in range(10)],
+    "recovered": [900000 - i * 45000 for i in range(10)],
+    "active": [80000 - i * 4000 for i in range(10)],
+    "critical": [500 - i * 20 for i in range(10)],
+    "todayCases": [1000 - i * 50 for i in range(10)],
+})
+
+def render():
+    chart = getattr(app, builder_name)(df)
+    if output == "plotly":
+        chart.to_json()
+    elif output == "vega":
+        chart.to_dict()
+
+started = time.perf_counter()
+if backend_module == "matplotlib.pyplot":
+    app.load_pyplot()
+else:
+    importlib.import_module(backend_module)
+backend_import = time.perf_counter() - started
+
+started = time.perf_counter()
+render()
+first_render = time.perf_counter() - started
+
+started = time.perf_counter()
+render()
+warm_render = time.perf_counter() - started
+
+print(json.dumps({
+    "app_import": app_import,
+    "eager_plotting_modules": eager,
+    "backend_import": backend_import,
+    "first_render": first_render,
+    "warm_render": warm_render,
+}))
+"""
+
+
+def run_probe(backend):
+    module, builder, output = BACKENDS[backend]
+    env = dict(os.environ, MPLBACKEND="Agg")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, APP_DIR, module, builder, output, json.dumps(PLOTTING_MODULES)],
+        capture_output=True, text=True, env=env, cwd=APP_DIR,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{backend} probe failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def build_report(args):
+    backends = {}
+    app_imports = []
+    eager = set()
+    for backend in args.backends:
+        runs = [run_probe(backend) for _ in range(args.repeat)]
+        app_imports.extend(run["app_import"] for run in runs)
+        for run in runs:
+            eager.update(run["eager_plotting_modules"])
+
+        stats = {}
+        for key in ("backend_import", "first_render", "warm_render"):
+            stats[f"{key}_ms"] = statistics.median(run[key] for run in runs) * 1000
+        # What the first viewer of this chart waits for on a fresh replica
+        stats["cold_start_ms"] = statistics.median(
+            run["app_import"] + run["backend_import"] + run["first_render"] for run in runs
+        ) * 1000
+        backends[backend] = stats
+
+    return {
+        "repeat": args.repeat,
+        "python": sys.version.split()[0],
+        "app_import_ms": statistics.median(app_imports) * 1000,
+        "eager_plotting_modules": sorted(eager),
+        "backends": backends,
+    }
+
+
+def print_report(report):
+    print(f"app.py import {report['app_import_ms']:.0f} ms (median of {report['repeat']} fresh processes)")
+    if report["eager_plotting_modules"]:
+        print(f"WARNING: imported at app start: {', '.join(report['eager_plotting_modules'])}")
+    print(f"{'backend':<12}{'import ms':>11}{'first ms':>10}{'warm ms':>9}{'cold start ms':>15}")
+    for backend, stats in report["backends"].items():
+        print(f"{backend:<12}{stats['backend_import_ms']:>11.0f}{stats['first_render_ms']:>10.0f}"
+              f"{stats['warm_render_ms']:>9.1f}{stats['cold_start_ms']:>15.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per backend")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-cold-start-ms", type=float,
+                        help="exit non-zero if any backend's cold start exceeds this")
+    args = parser.parse_args()
+
+    try:
+        report = build_report(args)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report["eager_plotting_modules"]:
+        return 1
+    if args.max_cold_start_ms is not None:
+        slow = [name for name, stats in report["backends"].items()
+                if stats["cold_start_ms"] > args.max_cold_start_ms]
+        if slow:
+            print(f"cold start over {args.max_cold_start_ms:.0f} ms: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Local stand-in for the disease.sh API, for exercising the dashboard offline.
+
+Serves /countries and /historical/<country>?lastdays=N with deterministic
+synthetic data, and can fail a fraction of requests with 503 or add latency
+to exercise retries and concurrent ingestion. Successful responses carry an
+ETag and Last-Modified, and conditional requests (If-None-Match or
+If-Modified-Since) that still match get a 304.
+Point the app at it with COVID_API_BASE:
+
+    python 4/fixture_server.py --port 8765 --countries 200 --fail-rate 0.1
+    COVID_API_BASE=http://127.0.0.1:8765 streamlit run 4/app.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+def build_countries(count):
+    countries = []
+    for i in range(count):
+        cases = 1_000_000 // (i + 1) + 1000
+        countries.append({
+            "country": f"Country {i:03d}",
+            "countryInfo": {"iso3": f"C{i:02d}" if i < 100 else None},
+            "cases": cases,
+            "todayCases": cases // 500,
+            "deaths": cases // 50,
+            "recovered": cases * 9 // 10,
+            "active": cases // 20,
+            "critical": cases // 2000,
+        })
+    return countries
+
+
+def build_timeline(index, days, end):
+    timeline = {"cases": {}, "deaths": {}, "recovered": {}}
+    for offset in range(days):
+        day = end - timedelta(days=days - 1 - offset)
+        key = f"{day.month}/{day.day}/{day:%y}"
+        cases = (offset + 1) * (1000 // (index + 1) + 10)
+        timeline["cases"][key] = cases
+        timeline["deaths"][key] = cases // 50
+        timeline["recovered"][key] = cases * 9 // 10
+    return timeline
+
+
+# If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+def not_modified(headers, etag, last_modified):
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        # Only successful responses are cacheable
+        if status == 200:
+            server = self.server
+            headers["ETag"] = f'"{hashlib.sha1(body).hexdigest()}"'
+            headers["Last-Modified"] = formatdate(server.last_modified, usegmt=True)
+            if not_modified(self.headers, headers["ETag"], server.last_modified):
+                with server.lock:
+                    server.not_modified_count += 1
+                status, body = 304, b""
+                del headers["Content-Type"], headers["Content-Length"]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.random.random() < server.fail_rate:
+            return self.send_json(503, {"message": "injected failure"})
+
+        url = urlparse(self.path)
+        if url.path == "/countries":
+            return self.send_json(200, server.countries)
+        if url.path.startswith("/historical/"):
+            key = unquote(url.path[len("/historical/"):])
+            index = server.index.get(key)
+            if index is None:
+                return self.send_json(404, {"message": "Country not found or doesn't have any historical data"})
+            lastdays = parse_qs(url.query).get("lastdays", ["30"])[0]
+            days = server.days if lastdays == "all" else min(int(lastdays), server.days)
+            return self.send_json(200, {
+                "country": server.countries[index]["country"],
+                "province": ["mainland"],
+                "timeline": build_timeline(index, days, server.end_date),
+            })
+        self.send_json(404, {"message": "not found"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=0, countries=200, days=120, fail_rate=0.0,
+                latency=0.0, end_date=None, seed=0, verbose=False):
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.countries = build_countries(countries)
+    server.index = {}
+    for i, country in enumerate(server.countries):
+        server.index[country["country"]] = i
+        if country["countryInfo"]["iso3"]:
+            server.index[country["countryInfo"]["iso3"]] = i
+    server.days = days
+    server.end_date = end_date or date.today()
+    server.fail_rate = fail_rate
+    server.latency = latency
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.not_modified_count = 0
+    # The fixture data never changes while the server runs
+    server.last_modified = int(time.time())
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--days", type=int, default=120, help="length of each historical series")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.countries, args.days, args.fail_rate,
+                         args.latency, verbose=args.verbose)
+    print(f"Serving fixtures on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
 import hashlib
+import hmac
+import json
 import os
+import secrets
+import sqlite3
 from dotenv import load_dotenv
 import time
 import base64
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 
 # Set page configuration immediately
@@ -98,60 +107,352 @@ st.markdown("""
 # Load environment variables
 load_dotenv()
 
-# Database configuration
+# Database configuration. DATABASE_URL, when set, overrides the backend
+# settings; DB_BACKEND=sqlite runs against a local file, or fully in memory
+# with SQLITE_PATH=:memory:, using the same schema as MySQL.
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventory.db"))
 DB_USER = os.getenv("DB_USER", "root1")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "streamlit_demo")
 
+# Connection pool configuration (in-memory SQLite always uses one shared
+# connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Authentication configuration. Without SESSION_SECRET a random key is
+# generated per process, so sessions do not survive a server restart.
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "4"))
+AUTH_TIMEOUT_SECONDS = int(os.getenv("AUTH_TIMEOUT_SECONDS", "10"))
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(8 * 60 * 60)))
+
+# Performance instrumentation configuration. PERF_METRICS_FILE, when set,
+# receives Prometheus text-format metrics for a textfile collector.
+PERF_SAMPLE_SIZE = int(os.getenv("PERF_SAMPLE_SIZE", "1000"))
+PERF_METRICS_FILE = os.getenv("PERF_METRICS_FILE")
+PERF_EXPORT_INTERVAL_SECONDS = int(os.getenv("PERF_EXPORT_INTERVAL_SECONDS", "15"))
+
+# Dashboard metrics configuration
+LOW_STOCK_THRESHOLD = 10
+METRICS_RESYNC_SECONDS = int(os.getenv("METRICS_RESYNC_SECONDS", "300"))
+
+# Bulk import configuration
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# Product listing configuration
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+PRODUCT_COLUMNS = "id, name, category, price, inventory, created_at, updated_at"
+# Keyset sort columns. Seeks compare the raw column so its index serves
+# both the predicate and the ORDER BY; category is the only nullable one
+# and gets explicit IS NULL branches (NULLs sort first on both backends).
+SORT_COLUMNS = ["id", "name", "price", "inventory", "category"]
+NULLABLE_SORT_COLUMNS = {"category"}
+
+# Resolve the SQLAlchemy URL for the configured backend
+def database_url():
+    if DATABASE_URL:
+        return DATABASE_URL
+    if DB_BACKEND == "sqlite":
+        return "sqlite://" if SQLITE_PATH == ":memory:" else f"sqlite:///{SQLITE_PATH}"
+    return f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Engine keyword arguments, including pool sizing, for a backend URL
+def engine_options(url):
+    pool_options = {
+        "poolclass": QueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if not url.startswith("sqlite"):
+        return pool_options
+    
+    # Streamlit runs each session on its own thread
+    connect_args = {"check_same_thread": False, "timeout": DB_POOL_TIMEOUT}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # Every connection to :memory: is a separate database, so all
+        # sessions share one. A sqlite3 connection is not safe to use from
+        # several threads at once, so a single-slot pool hands it to one
+        # session at a time; the others wait up to DB_POOL_TIMEOUT.
+        return {
+            "poolclass": QueuePool,
+            "pool_size": 1,
+            "max_overflow": 0,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": -1,
+            "pool_pre_ping": False,
+            "creator": shared_connection_creator(lambda: sqlite3.connect(":memory:", **connect_args)),
+        }
+    return {**pool_options, "connect_args": connect_args}
+
+# Creator that always returns the same DB-API connection, so the in-memory
+# database survives the pool replacing its connection record
+def shared_connection_creator(connect):
+    lock = threading.Lock()
+    connections = []
+    def creator():
+        with lock:
+            if not connections:
+                connections.append(connect())
+            return connections[0]
+    return creator
+
 # Create database connection
 @st.cache_resource
 def init_connection():
     try:
-        connection_string = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        engine = create_engine(connection_string)
+        connection_string = database_url()
+        engine = create_engine(connection_string, **engine_options(connection_string))
+        
+        if engine.dialect.name == "sqlite":
+            @event.listens_for(engine, "connect")
+            def configure_sqlite(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                # WAL lets readers proceed while another session writes
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA foreign_keys=ON")
+                cursor.close()
+        
         return engine
     except Exception as e:
         show_error(f"Database connection error: {e}")
         return None
 
-# Initialize database schema if needed
+# Backend URL with the password masked
+def engine_url_for_display():
+    engine = init_connection()
+    return engine.url.render_as_string(hide_password=True) if engine is not None else "not connected"
+
+# SQLAlchemy dialect name of the configured backend
+def database_dialect():
+    engine = init_connection()
+    return engine.dialect.name if engine is not None else None
+
+# Pool configuration and live checkout statistics
+def pool_statistics():
+    engine = init_connection()
+    if engine is None:
+        return {}
+    
+    pool = engine.pool
+    options = engine_options(database_url())
+    stats = {"backend": engine.dialect.name, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            "max_overflow": options["max_overflow"],
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout": options["pool_timeout"],
+            "recycle": options["pool_recycle"],
+            "pre_ping": options["pool_pre_ping"],
+        })
+    return stats
+
+# Versioned schema migrations. Each entry is applied once, in order, and
+# recorded in schema_migrations; add new entries to the end of the list.
+# A statement is either portable SQL or a dict of per-dialect variants.
+MIGRATIONS = [
+    (1, "Create users and products tables", [
+        {
+            "mysql": """
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(50) UNIQUE NOT NULL,
+                password_hash VARCHAR(64) NOT NULL,
+                is_admin BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "sqlite": """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username VARCHAR(50) UNIQUE NOT NULL,
+                password_hash VARCHAR(64) NOT NULL,
+                is_admin BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        },
+        {
+            "mysql": """
+            CREATE TABLE IF NOT EXISTS products (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                category VARCHAR(50),
+                price DECIMAL(10, 2) NOT NULL,
+                inventory INT DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+            """,
+            "sqlite": """
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(100) NOT NULL,
+                category VARCHAR(50),
+                price DECIMAL(10, 2) NOT NULL,
+                inventory INT DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        },
+        # SQLite has no ON UPDATE clause, so touch updated_at with a trigger
+        {
+            "sqlite": """
+            CREATE TRIGGER IF NOT EXISTS products_touch_updated_at
+            AFTER UPDATE ON products
+            FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+            BEGIN
+                UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            END
+            """,
+        },
+    ]),
+    (2, "Index products for the filter, sort and dashboard queries", [
+        # Category filter + price range, and a covering index for the
+        # per-category dashboard summary and DISTINCT category lookups
+        "CREATE INDEX idx_products_category_price_inventory ON products (category, price, inventory)",
+        # Price range without a category filter, and ORDER BY price
+        "CREATE INDEX idx_products_price ON products (price)",
+        # ORDER BY name and ORDER BY inventory keyset pages
+        "CREATE INDEX idx_products_name ON products (name)",
+        "CREATE INDEX idx_products_inventory ON products (inventory)",
+    ]),
+    (3, "Widen password_hash for salted PBKDF2 hashes", [
+        # SQLite does not enforce VARCHAR lengths
+        {"mysql": "ALTER TABLE users MODIFY password_hash VARCHAR(255) NOT NULL"},
+    ]),
+    (4, "Make products.inventory NOT NULL DEFAULT 0", [
+        "UPDATE products SET inventory = 0 WHERE inventory IS NULL",
+        {"mysql": "ALTER TABLE products MODIFY inventory INT NOT NULL DEFAULT 0"},
+        # SQLite cannot add NOT NULL to an existing column: rebuild the
+        # table, then restore its indexes and trigger
+        {
+            "sqlite": """
+            CREATE TABLE products_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(100) NOT NULL,
+                category VARCHAR(50),
+                price DECIMAL(10, 2) NOT NULL,
+                inventory INT NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        },
+        {
+            "sqlite": """
+            INSERT INTO products_new (id, name, category, price, inventory, created_at, updated_at)
+            SELECT id, name, category, price, inventory, created_at, updated_at FROM products
+            """,
+        },
+        {"sqlite": "DROP TABLE products"},
+        {"sqlite": "ALTER TABLE products_new RENAME TO products"},
+        {"sqlite": "CREATE INDEX idx_products_category_price_inventory ON products (category, price, inventory)"},
+        {"sqlite": "CREATE INDEX idx_products_price ON products (price)"},
+        {"sqlite": "CREATE INDEX idx_products_name ON products (name)"},
+        {"sqlite": "CREATE INDEX idx_products_inventory ON products (inventory)"},
+        {
+            "sqlite": """
+            CREATE TRIGGER IF NOT EXISTS products_touch_updated_at
+            AFTER UPDATE ON products
+            FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+            BEGIN
+                UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            END
+            """,
+        },
+    ]),
+    (5, "Index products on (sort column, id) for keyset pages", [
+        # Keyset pages order by (column, id); with id in the index the
+        # seek and ORDER BY are served without a sort
+        "CREATE INDEX idx_products_inventory_id ON products (inventory, id)",
+        "CREATE INDEX idx_products_category_id ON products (category, id)",
+        {
+            "mysql": "DROP INDEX idx_products_inventory ON products",
+            "sqlite": "DROP INDEX IF EXISTS idx_products_inventory",
+        },
+    ]),
+    (6, "Index products on (category, sort column, id) for filtered keyset pages", [
+        # With a category selected, the equality on category leads, so each
+        # sort column needs its own (category, column, id) index for the
+        # page to be read in order instead of sorting the whole category
+        "CREATE INDEX idx_products_category_name_id ON products (category, name, id)",
+        "CREATE INDEX idx_products_category_price_id ON products (category, price, id)",
+        "CREATE INDEX idx_products_category_inventory_id ON products (category, inventory, id)",
+    ]),
+]
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# MySQL commits DDL as it runs, and pysqlite does not wrap DDL in the
+# transaction either, so a version that failed part-way may have left some
+# of its indexes behind. Index DDL is made safe to repeat: SQLite gets
+# IF NOT EXISTS, MySQL (which lacks it) skips "duplicate key name" and
+# "can't drop a missing key" errors.
+MYSQL_REPEATED_DDL_ERRORS = {1061, 1091}
+CREATE_INDEX_PATTERN = re.compile(r"^\s*CREATE INDEX (?!IF NOT EXISTS)", re.IGNORECASE)
+
+def execute_migration_statement(conn, statement):
+    if conn.dialect.name == "sqlite":
+        statement = CREATE_INDEX_PATTERN.sub("CREATE INDEX IF NOT EXISTS ", statement)
+    try:
+        conn.execute(text(statement))
+    except sqlalchemy.exc.DBAPIError as e:
+        code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+        if conn.dialect.name != "mysql" or code not in MYSQL_REPEATED_DDL_ERRORS:
+            raise
+
+# Apply pending migrations, one transaction per version
+def run_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_MIGRATIONS_TABLE))
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            for statement in statements:
+                if isinstance(statement, dict):
+                    statement = statement.get(engine.dialect.name)
+                if statement:
+                    execute_migration_statement(conn, statement)
+            conn.execute(text(
+                "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"
+            ), {"version": version, "description": description})
+
+# Migrate the schema and seed the default admin and sample products
 def initialize_database():
     engine = init_connection()
     if engine is None:
         return False
     
-    # Create users table if it doesn't exist
-    create_users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        username VARCHAR(50) UNIQUE NOT NULL,
-        password_hash VARCHAR(64) NOT NULL,
-        is_admin BOOLEAN DEFAULT FALSE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """
-    
-    # Create products table if it doesn't exist
-    create_products_table = """
-    CREATE TABLE IF NOT EXISTS products (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(100) NOT NULL,
-        category VARCHAR(50),
-        price DECIMAL(10, 2) NOT NULL,
-        inventory INT DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-    );
-    """
-    
     try:
+        run_migrations(engine)
+        
         with engine.begin() as conn:
-            # Create tables
-            conn.execute(text(create_users_table))
-            conn.execute(text(create_products_table))
-            
             # Check if admin user exists
             result = conn.execute(text("SELECT COUNT(*) FROM users WHERE is_admin = TRUE"))
             admin_exists = result.scalar()
@@ -177,42 +478,440 @@ def initialize_database():
                     ("Robotic Vacuum", "Appliances", 279.99, 10)
                 ]
                 
-                for product in sample_products:
-                    conn.execute(text(
-                        "INSERT INTO products (name, category, price, inventory) VALUES (:name, :category, :price, :inventory)"
-                    ), {"name": product[0], "category": product[1], "price": product[2], "inventory": product[3]})
+                insert_product_rows(conn, [
+                    {"name": product[0], "category": product[1], "price": product[2], "inventory": product[3]}
+                    for product in sample_products
+                ])
         
         return True
     except Exception as e:
         show_error(f"Database initialization error: {e}")
         return False
 
-# Execute query with caching for read-only queries
-@st.cache_data(ttl=60)
-def run_query(query, params=None):
+# Run migrations once per server process at startup
+@st.cache_resource
+def ensure_database():
+    if not initialize_database():
+        # Not cached, so the next rerun retries
+        raise RuntimeError("Database initialization failed")
+    return True
+
+# Query instrumentation. Statement latency, rows and cache hits are kept
+# per normalized SQL statement with a bounded window of latency samples,
+# alongside per-page rerun timings, for the admin panel and Prometheus.
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+@st.cache_resource
+def get_perf_stats():
+    return {"lock": threading.Lock(), "queries": {}, "reruns": {}, "exported_at": 0.0}
+
+# Tracks whether the cached function body ran during the current read
+read_state = threading.local()
+
+def statement_label(query):
+    return WHITESPACE_PATTERN.sub(" ", query).strip()
+
+def query_stats_entry(stats, query):
+    return stats["queries"].setdefault(statement_label(query), {
+        "latencies": deque(maxlen=PERF_SAMPLE_SIZE),
+        "calls": 0,
+        "seconds_total": 0.0,
+        "rows_total": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+    })
+
+def record_statement(query, seconds, rows):
+    stats = get_perf_stats()
+    with stats["lock"]:
+        entry = query_stats_entry(stats, query)
+        entry["latencies"].append(seconds)
+        entry["calls"] += 1
+        entry["seconds_total"] += seconds
+        entry["rows_total"] += max(rows or 0, 0)
+
+def record_cache_access(query, hit):
+    stats = get_perf_stats()
+    with stats["lock"]:
+        entry = query_stats_entry(stats, query)
+        entry["cache_hits" if hit else "cache_misses"] += 1
+
+def record_rerun(page, seconds):
+    stats = get_perf_stats()
+    with stats["lock"]:
+        entry = stats["reruns"].setdefault(page, {
+            "latencies": deque(maxlen=PERF_SAMPLE_SIZE),
+            "count": 0,
+            "seconds_total": 0.0,
+        })
+        entry["latencies"].append(seconds)
+        entry["count"] += 1
+        entry["seconds_total"] += seconds
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+# Per-statement summary for the admin panel
+def query_performance_table():
+    stats = get_perf_stats()
+    with stats["lock"]:
+        entries = [(label, dict(entry, latencies=list(entry["latencies"]))) for label, entry in stats["queries"].items()]
+    
+    rows = []
+    for label, entry in entries:
+        lookups = entry["cache_hits"] + entry["cache_misses"]
+        rows.append({
+            "query": label,
+            "db_calls": entry["calls"],
+            "p50_ms": percentile(entry["latencies"], 0.50) * 1000,
+            "p99_ms": percentile(entry["latencies"], 0.99) * 1000,
+            "avg_rows": entry["rows_total"] / entry["calls"] if entry["calls"] else 0.0,
+            "cache_hit_rate": entry["cache_hits"] / lookups if lookups else None,
+        })
+    return pd.DataFrame(rows, columns=["query", "db_calls", "p50_ms", "p99_ms", "avg_rows", "cache_hit_rate"])
+
+def rerun_performance_table():
+    stats = get_perf_stats()
+    with stats["lock"]:
+        entries = [(page, list(entry["latencies"]), entry["count"]) for page, entry in stats["reruns"].items()]
+    return pd.DataFrame(
+        [(page, count, percentile(latencies, 0.50) * 1000, percentile(latencies, 0.99) * 1000)
+         for page, latencies, count in entries],
+        columns=["page", "reruns", "p50_ms", "p99_ms"]
+    )
+
+def prometheus_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+# Render all collected metrics in Prometheus text exposition format
+def render_prometheus_metrics():
+    stats = get_perf_stats()
+    with stats["lock"]:
+        queries = [(label, dict(entry, latencies=list(entry["latencies"]))) for label, entry in stats["queries"].items()]
+        reruns = [(page, dict(entry, latencies=list(entry["latencies"]))) for page, entry in stats["reruns"].items()]
+    
+    lines = [
+        "# HELP inventory_query_duration_seconds Database statement latency.",
+        "# TYPE inventory_query_duration_seconds summary",
+    ]
+    for label, entry in queries:
+        labels = f'query_id="{hashlib.sha1(label.encode()).hexdigest()[:12]}",query="{prometheus_label(label[:200])}"'
+        for q in (0.5, 0.99):
+            lines.append(f'inventory_query_duration_seconds{{{labels},quantile="{q}"}} {percentile(entry["latencies"], q):.6f}')
+        lines.append(f"inventory_query_duration_seconds_sum{{{labels}}} {entry['seconds_total']:.6f}")
+        lines.append(f"inventory_query_duration_seconds_count{{{labels}}} {entry['calls']}")
+    
+    for name, key, help_text in (
+        ("inventory_query_rows_total", "rows_total", "Rows returned or affected by database statements."),
+        ("inventory_query_cache_hits_total", "cache_hits", "Reads served from the query cache."),
+        ("inventory_query_cache_misses_total", "cache_misses", "Reads that missed the query cache."),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for label, entry in queries:
+            labels = f'query_id="{hashlib.sha1(label.encode()).hexdigest()[:12]}"'
+            lines.append(f"{name}{{{labels}}} {entry[key]}")
+    
+    lines.append("# HELP inventory_rerun_duration_seconds Full script rerun latency per page.")
+    lines.append("# TYPE inventory_rerun_duration_seconds summary")
+    for page, entry in reruns:
+        for q in (0.5, 0.99):
+            lines.append(f'inventory_rerun_duration_seconds{{page="{page}",quantile="{q}"}} {percentile(entry["latencies"], q):.6f}')
+        lines.append(f'inventory_rerun_duration_seconds_sum{{page="{page}"}} {entry["seconds_total"]:.6f}')
+        lines.append(f'inventory_rerun_duration_seconds_count{{page="{page}"}} {entry["count"]}')
+    
+    return "\n".join(lines) + "\n"
+
+# Periodically write metrics to PERF_METRICS_FILE for scraping
+def export_prometheus_metrics():
+    if not PERF_METRICS_FILE:
+        return
+    stats = get_perf_stats()
+    with stats["lock"]:
+        if time.time() - stats["exported_at"] < PERF_EXPORT_INTERVAL_SECONDS:
+            return
+        stats["exported_at"] = time.time()
+    
+    # Write then rename so the collector never reads a partial file
+    temp_path = f"{PERF_METRICS_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            f.write(render_prometheus_metrics())
+        os.replace(temp_path, PERF_METRICS_FILE)
+    except OSError:
+        # A failed export must not break the page; retry next interval
+        pass
+
+# Execute a read query against the database without caching
+def fetch_query(query, params=None):
     engine = init_connection()
     if engine is None:
         return None
     
     try:
+        started = time.perf_counter()
         with engine.connect() as conn:
             result = conn.execute(text(query), params or {})
-            return pd.DataFrame(result.fetchall(), columns=result.keys())
+            frame = pd.DataFrame(result.fetchall(), columns=result.keys())
+        record_statement(query, time.perf_counter() - started, len(frame))
+        return frame
     except Exception as e:
-        # If table doesn't exist, try to initialize database
-        if "doesn't exist" in str(e):
-            with st.spinner("Setting up database..."):
-                if initialize_database():
-                    # Try the query again after initialization
-                    with engine.connect() as conn:
-                        result = conn.execute(text(query), params or {})
-                        return pd.DataFrame(result.fetchall(), columns=result.keys())
-                else:
-                    show_error(f"Query execution error: {e}")
-                    return None
+        show_error(f"Query execution error: {e}")
+        return None
+
+# Table-scoped cache invalidation. Every cached read is keyed on the
+# current generation of each table it reads; a write bumps only the
+# generations of the tables it touches, so unrelated cached results stay
+# valid and stale entries simply age out of the cache.
+READ_TABLES_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+WRITE_TABLES_PATTERN = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+    re.IGNORECASE
+)
+
+@st.cache_resource
+def get_table_generations():
+    return {"lock": threading.Lock(), "tables": {}}
+
+def table_generations(query):
+    tables = sorted(set(name.lower() for name in READ_TABLES_PATTERN.findall(query)))
+    store = get_table_generations()
+    with store["lock"]:
+        return tuple((table, store["tables"].get(table, 0)) for table in tables)
+
+def invalidate_tables(tables):
+    store = get_table_generations()
+    with store["lock"]:
+        for table in tables:
+            table = table.lower()
+            store["tables"][table] = store["tables"].get(table, 0) + 1
+
+# Request coalescing. Identical reads within one rerun are answered from
+# a per-rerun memo. Concurrent cache misses for the same read from
+# different sessions are already coalesced by st.cache_data, which holds a
+# per-key lock while computing, so TTL expiry does not cause a thundering herd.
+def freeze_params(params):
+    return tuple(sorted((params or {}).items()))
+
+def memoized_read(key, query, loader):
+    memo = st.session_state.get("query_memo")
+    if memo is not None and key in memo:
+        record_cache_access(query, hit=True)
+        return memo[key].copy()
+    read_state.miss = False
+    result = loader()
+    record_cache_access(query, hit=not read_state.miss)
+    if memo is not None and result is not None:
+        memo[key] = result.copy()
+    return result
+
+# Cached read keyed on (query, params, table generations)
+@st.cache_data(ttl=60)
+def cached_query(query, params, generations):
+    read_state.miss = True
+    return fetch_query(query, params)
+
+# Execute query with caching for read-only queries
+def run_query(query, params=None):
+    generations = table_generations(query)
+    return memoized_read(
+        ("query", query, freeze_params(params), generations),
+        query,
+        lambda: cached_query(query, params, generations)
+    )
+
+# Stream rows through a server-side cursor, one DataFrame per batch
+def stream_query(query, params=None, batch_size=500):
+    engine = init_connection()
+    if engine is None:
+        return
+    
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(query), params or {})
+            columns = list(result.keys())
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+    except Exception as e:
+        show_error(f"Query execution error: {e}")
+
+# Fetch a single listing page; the query carries its own LIMIT so the
+# stream stops after one batch and memory is bounded by the page size
+def fetch_product_page(query, params, page_size):
+    started = time.perf_counter()
+    batches = stream_query(query, params, batch_size=page_size + 1)
+    try:
+        page = next(batches, None)
+    finally:
+        batches.close()
+    record_statement(query, time.perf_counter() - started, len(page) if page is not None else 0)
+    return page
+
+@st.cache_data(ttl=60)
+def cached_product_page(query, params, page_size, generations):
+    read_state.miss = True
+    return fetch_product_page(query, params, page_size)
+
+def load_product_page(query, params, page_size):
+    generations = table_generations(query)
+    return memoized_read(
+        ("page", query, freeze_params(params), page_size, generations),
+        query,
+        lambda: cached_product_page(query, params, page_size, generations)
+    )
+
+# Seek predicate for rows after (cursor_key, cursor_id) in (column, id) order
+def keyset_predicate(column, descending, cursor_key):
+    op = "<" if descending else ">"
+    if cursor_key is None:
+        # The previous page ended inside the leading run of NULLs
+        if descending:
+            return f"({column} IS NULL AND id < :cursor_id)"
+        return f"(({column} IS NULL AND id > :cursor_id) OR {column} IS NOT NULL)"
+    # Row-value form on every backend: MySQL and SQLite (3.15+) both turn it
+    # into one index range. The OR expansion names :cursor_key twice, which
+    # reaches pysqlite as two separate ? parameters, so SQLite could not
+    # derive a range from it and rescanned the pages already shown.
+    predicate = f"({column}, id) {op} (:cursor_key, :cursor_id)"
+    # Descending pages reach the NULLs last
+    if descending and column in NULLABLE_SORT_COLUMNS:
+        predicate = f"({predicate} OR {column} IS NULL)"
+    return predicate
+
+# Build a keyset (seek) query for one page of the product listing
+def build_product_page_query(category, price_range, sort_by, descending, cursor, page_size, dialect):
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort_by}")
+    query = f"SELECT {PRODUCT_COLUMNS} FROM products WHERE 1=1"
+    params = {}
+    
+    if category != "All":
+        query += " AND category = :category"
+        params["category"] = category
+    
+    # SQLite only: unary plus keeps the planner off the price index when
+    # sorting by another column, so it walks the sort index and stops at the
+    # LIMIT. MySQL discards a unary plus; its prefer_ordering_index heuristic
+    # makes the same choice for small LIMITs, and the plan check flags any
+    # filesort when it does not.
+    price = "+price" if dialect == "sqlite" and sort_by != "price" else "price"
+    query += f" AND {price} BETWEEN :min_price AND :max_price"
+    params["min_price"] = price_range[0]
+    params["max_price"] = price_range[1]
+    
+    # Seek past the last row of the previous page on (sort column, id)
+    if cursor is not None:
+        if sort_by == "id":
+            query += f" AND id {'<' if descending else '>'} :cursor_id"
         else:
-            show_error(f"Query execution error: {e}")
-            return None
+            query += f" AND {keyset_predicate(sort_by, descending, cursor[0])}"
+            if cursor[0] is not None:
+                params["cursor_key"] = cursor[0]
+        params["cursor_id"] = cursor[1]
+    
+    direction = "DESC" if descending else "ASC"
+    if sort_by == "id":
+        query += f" ORDER BY id {direction}"
+    else:
+        query += f" ORDER BY {sort_by} {direction}, id {direction}"
+    # Fetch one extra row to know whether a next page exists
+    query += f" LIMIT {int(page_size) + 1}"
+    
+    return query, params
+
+# Page navigation callbacks for the product listing
+def go_to_next_page(cursor):
+    st.session_state.page_cursors.append(cursor)
+
+def go_to_previous_page():
+    if len(st.session_state.page_cursors) > 1:
+        st.session_state.page_cursors.pop()
+
+# Insert product rows with batched executemany calls on an open transaction
+PRODUCT_INSERT_QUERY = "INSERT INTO products (name, category, price, inventory) VALUES (:name, :category, :price, :inventory)"
+
+def insert_product_rows(conn, rows):
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        conn.execute(text(PRODUCT_INSERT_QUERY), rows[start:start + IMPORT_BATCH_SIZE])
+
+# Write one import chunk in its own transaction
+def import_product_chunk(rows):
+    engine = init_connection()
+    if engine is None:
+        return False
+    
+    try:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            insert_product_rows(conn, rows)
+        record_statement(PRODUCT_INSERT_QUERY, time.perf_counter() - started, len(rows))
+        record_write(PRODUCT_INSERT_QUERY, rows)
+        return True
+    except Exception as e:
+        show_error(f"Import error: {e}")
+        return False
+
+# Read an uploaded CSV or Parquet file in chunks, yielding (chunk, progress)
+def read_product_chunks(uploaded_file):
+    if uploaded_file.name.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(uploaded_file)
+        total_rows = max(parquet_file.metadata.num_rows, 1)
+        rows_read = 0
+        for batch in parquet_file.iter_batches(batch_size=IMPORT_CHUNK_SIZE):
+            rows_read += batch.num_rows
+            yield batch.to_pandas(), rows_read / total_rows
+    else:
+        total_bytes = max(uploaded_file.size, 1)
+        for chunk in pd.read_csv(uploaded_file, chunksize=IMPORT_CHUNK_SIZE):
+            yield chunk, min(uploaded_file.tell() / total_bytes, 1.0)
+
+# Validate an import chunk, returning insertable rows and the rejected count
+def validate_product_chunk(chunk):
+    chunk = chunk.rename(columns=lambda c: str(c).strip().lower())
+    missing = {"name", "price"} - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(sorted(missing))}")
+    
+    rows = pd.DataFrame({
+        "name": chunk["name"].astype("string").str.strip(),
+        "category": (
+            chunk["category"].astype("string").str.strip().replace("", pd.NA)
+            if "category" in chunk.columns else pd.Series(pd.NA, index=chunk.index, dtype="string")
+        ),
+        "price": pd.to_numeric(chunk["price"], errors="coerce").round(2),
+        "inventory": (
+            pd.to_numeric(chunk["inventory"], errors="coerce").fillna(0)
+            if "inventory" in chunk.columns else pd.Series(0, index=chunk.index)
+        ),
+    })
+    
+    valid = (
+        rows["name"].notna()
+        & (rows["name"].str.len().between(1, 100))
+        & (rows["category"].isna() | (rows["category"].str.len() <= 50))
+        & (rows["price"] > 0)
+        & (rows["inventory"] >= 0)
+        & (rows["inventory"] % 1 == 0)
+    ).fillna(False)
+    rows = rows[valid]
+    
+    records = [
+        {
+            "name": str(row.name),
+            "category": None if pd.isna(row.category) else str(row.category),
+            "price": float(row.price),
+            "inventory": int(row.inventory),
+        }
+        for row in rows.itertuples(index=False)
+    ]
+    return records, int((~valid).sum())
 
 # Execute query without caching for write operations
 def execute_query(query, params=None):
@@ -221,35 +920,130 @@ def execute_query(query, params=None):
         return False
     
     try:
+        started = time.perf_counter()
         with engine.begin() as conn:
-            conn.execute(text(query), params or {})
-            return True
+            result = conn.execute(text(query), params or {})
+        record_statement(query, time.perf_counter() - started, result.rowcount)
+        record_write(query, params)
+        return True
     except Exception as e:
-        # If table doesn't exist, try to initialize database
-        if "doesn't exist" in str(e):
-            with st.spinner("Setting up database..."):
-                if initialize_database():
-                    # Try the query again after initialization
-                    with engine.begin() as conn:
-                        conn.execute(text(query), params or {})
-                        return True
-                else:
-                    show_error(f"Query execution error: {e}")
-                    return False
-        else:
-            show_error(f"Query execution error: {e}")
-            return False
+        show_error(f"Query execution error: {e}")
+        return False
+
+# Keep caches and derived state in sync after a successful write
+def record_write(query, params=None):
+    invalidate_tables(WRITE_TABLES_PATTERN.findall(query))
+    if PRODUCT_INSERT_PATTERN.match(query):
+        record_product_insert(params)
+
+# Authentication. Password hashing uses salted PBKDF2 and runs on a small
+# shared thread pool, which bounds how much CPU concurrent logins can take;
+# hashlib releases the GIL, so other sessions keep running meanwhile. A
+# successful login issues an HMAC-signed session token that later reruns
+# validate in memory without a database round trip.
+PASSWORD_HASH_PREFIX = "pbkdf2_sha256"
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def b64decode(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
 
 # Hash password for secure storage
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password, iterations=PASSWORD_HASH_ITERATIONS):
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{PASSWORD_HASH_PREFIX}${iterations}${b64encode(salt)}${b64encode(digest)}"
+
+# Check a password against a stored hash in constant time
+def check_password(password, stored_hash):
+    if stored_hash.startswith(PASSWORD_HASH_PREFIX + "$"):
+        # A malformed stored hash (wrong field count, bad iteration count or
+        # base64) fails the check instead of erroring the login
+        try:
+            _, iterations, salt, expected = stored_hash.split("$")
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode(), b64decode(salt), int(iterations))
+            return hmac.compare_digest(digest, b64decode(expected))
+        except ValueError:
+            return False
+    # Legacy unsalted SHA-256 hashes, upgraded on the next successful login
+    return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored_hash)
+
+def password_needs_rehash(stored_hash):
+    return not stored_hash.startswith(f"{PASSWORD_HASH_PREFIX}${PASSWORD_HASH_ITERATIONS}$")
+
+@st.cache_resource
+def get_auth_executor():
+    return ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
 
-# Verify password
-def verify_password(username, password):
-    hashed_password = hash_password(password)
-    query = "SELECT * FROM users WHERE username = :username AND password_hash = :password_hash"
-    result = run_query(query, {"username": username, "password_hash": hashed_password})
-    return not result.empty if result is not None else False
+# On timeout the task is cancelled if it has not started yet, so a backlog
+# of abandoned logins does not keep the pool busy
+def run_auth_task(fn, *args):
+    future = get_auth_executor().submit(fn, *args)
+    try:
+        return future.result(timeout=AUTH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+# Verify credentials and return the user, or None if they do not match
+def authenticate_user(username, password):
+    # Looked up uncached and by username only, never keyed on the password
+    result = fetch_query(
+        "SELECT id, username, password_hash, is_admin FROM users WHERE username = :username",
+        {"username": username}
+    )
+    if result is None or result.empty:
+        # Spend the same hashing time so unknown usernames are not revealed
+        run_auth_task(hash_password, password)
+        return None
+    
+    user = result.iloc[0]
+    if not run_auth_task(check_password, password, user["password_hash"]):
+        return None
+    
+    if password_needs_rehash(user["password_hash"]):
+        # The password is already verified; a busy pool only postpones the
+        # upgrade to a later login
+        try:
+            new_hash = run_auth_task(hash_password, password)
+        except FutureTimeoutError:
+            new_hash = None
+        if new_hash is not None:
+            execute_query(
+                "UPDATE users SET password_hash = :password_hash WHERE id = :id",
+                {"password_hash": new_hash, "id": int(user["id"])}
+            )
+    return {"username": user["username"], "is_admin": bool(user["is_admin"])}
+
+@st.cache_resource
+def get_session_secret():
+    return SESSION_SECRET.encode() if SESSION_SECRET else secrets.token_bytes(32)
+
+def sign_session_payload(payload):
+    return b64encode(hmac.new(get_session_secret(), payload.encode(), hashlib.sha256).digest())
+
+# Issue a signed, expiring session token for an authenticated user
+def issue_session_token(user):
+    payload = b64encode(json.dumps({
+        "username": user["username"],
+        "is_admin": user["is_admin"],
+        "login_time": datetime.now().strftime("%H:%M:%S"),
+        "expires": int(time.time()) + SESSION_TTL_SECONDS,
+    }).encode())
+    return f"{payload}.{sign_session_payload(payload)}"
+
+# Validate a session token, returning its claims or None
+def validate_session_token(token):
+    if not token or token.count(".") != 1:
+        return None
+    payload, signature = token.split(".")
+    if not hmac.compare_digest(signature, sign_session_payload(payload)):
+        return None
+    claims = json.loads(b64decode(payload))
+    if claims["expires"] < time.time():
+        return None
+    return claims
 
 # Custom notification functions
 def show_info(message):
@@ -261,11 +1055,6 @@ def show_success(message):
 def show_error(message):
     st.markdown(f'<div class="error-box">{message}</div>', unsafe_allow_html=True)
 
-# Loading animation
-def show_loading_animation():
-    with st.spinner('Processing...'):
-        time.sleep(0.5)
-
 # User authentication system
 def login_page():
     # Add a logo or banner image
@@ -287,42 +1076,236 @@ def login_page():
                 submit = st.form_submit_button("Login", use_container_width=True)
             
             if submit:
-                show_loading_animation()
-                if verify_password(username, password):
-                    st.session_state.authenticated = True
-                    st.session_state.username = username
-                    st.session_state.login_time = datetime.now().strftime("%H:%M:%S")
-                    st.rerun()
+                try:
+                    with st.spinner("Signing in..."):
+                        user = authenticate_user(username, password)
+                except FutureTimeoutError:
+                    show_error("Sign-in is busy, please try again")
                 else:
-                    show_error("Invalid username or password")
+                    if user is not None:
+                        st.session_state.session_token = issue_session_token(user)
+                        st.rerun()
+                    else:
+                        show_error("Invalid username or password")
     
     # Add footer
     st.markdown('<div class="footer">© 2025 Inventory Manager Pro. All rights reserved.</div>', unsafe_allow_html=True)
 
+# Dashboard metrics summary, one aggregate row per category.
+# Loaded with a single pass over products and then kept current by the
+# insert path, so dashboard reruns read the in-process summary instead of
+# rescanning the catalog. A periodic resync picks up writes made outside
+# this process; one session runs it while the others keep reading the
+# current summary.
+PRODUCT_INSERT_PATTERN = re.compile(r"\s*INSERT\s+INTO\s+products\b", re.IGNORECASE)
+
+METRICS_SUMMARY_QUERY = f"""
+SELECT category,
+       COUNT(*) AS product_count,
+       COALESCE(SUM(price * inventory), 0) AS inventory_value,
+       SUM(CASE WHEN inventory < {LOW_STOCK_THRESHOLD} THEN 1 ELSE 0 END) AS low_stock_count
+FROM products
+GROUP BY category
+"""
+
+METRICS_RELOAD_ATTEMPTS = 3
+
+@st.cache_resource
+def get_metrics_summary():
+    return {
+        "lock": threading.Lock(),
+        "reload_lock": threading.Lock(),
+        "categories": None,
+        "loaded_at": 0.0,
+        "inserts": 0,
+    }
+
+def metrics_summary_stale(summary):
+    return summary["categories"] is None or time.time() - summary["loaded_at"] > METRICS_RESYNC_SECONDS
+
+def load_metrics_summary(summary):
+    # Single flight: a session that finds a reload running keeps the current
+    # summary, and only waits for it when nothing has been loaded yet
+    if not summary["reload_lock"].acquire(blocking=summary["categories"] is None):
+        return
+    try:
+        if not metrics_summary_stale(summary):
+            return
+        for attempt in range(METRICS_RELOAD_ATTEMPTS):
+            with summary["lock"]:
+                inserts = summary["inserts"]
+            result = fetch_query(METRICS_SUMMARY_QUERY)
+            if result is None:
+                return
+            categories = {
+                row.category: {
+                    "count": int(row.product_count),
+                    "value": float(row.inventory_value or 0),
+                    "low_stock": int(row.low_stock_count or 0),
+                }
+                for row in result.itertuples(index=False)
+            }
+            with summary["lock"]:
+                # An insert recorded while the query ran may or may not be in
+                # its result, so swapping could lose or double-count it; run
+                # the query again instead. If inserts keep landing, keep the
+                # current summary and leave it stale for a later rerun.
+                last_attempt = attempt == METRICS_RELOAD_ATTEMPTS - 1
+                if summary["inserts"] == inserts or (last_attempt and summary["categories"] is None):
+                    summary["categories"] = categories
+                    summary["loaded_at"] = time.time()
+                    return
+    finally:
+        summary["reload_lock"].release()
+
+def record_product_insert(params):
+    summary = get_metrics_summary()
+    rows = params if isinstance(params, (list, tuple)) else [params or {}]
+    with summary["lock"]:
+        summary["inserts"] += len(rows)
+        # Nothing loaded yet; the first read will do a full pass anyway
+        if summary["categories"] is None:
+            return
+        for row in rows:
+            inventory = int(row.get("inventory") or 0)
+            entry = summary["categories"].setdefault(
+                row.get("category"), {"count": 0, "value": 0.0, "low_stock": 0}
+            )
+            entry["count"] += 1
+            entry["value"] += float(row.get("price") or 0) * inventory
+            if inventory < LOW_STOCK_THRESHOLD:
+                entry["low_stock"] += 1
+
 # Dashboard metrics
 def get_dashboard_metrics():
-    metrics = {}
+    summary = get_metrics_summary()
+    if metrics_summary_stale(summary):
+        load_metrics_summary(summary)
+    
+    with summary["lock"]:
+        categories = {category: dict(entry) for category, entry in (summary["categories"] or {}).items()}
     
-    # Total products
-    query = "SELECT COUNT(*) as total FROM products"
-    result = run_query(query)
-    metrics['total_products'] = result['total'].iloc[0] if result is not None and not result.empty else 0
+    metrics = {
+        'total_products': sum(entry["count"] for entry in categories.values()),
+        'total_value': sum(entry["value"] for entry in categories.values()),
+        'low_stock': sum(entry["low_stock"] for entry in categories.values()),
+        'categories': pd.DataFrame(
+            [(category, entry["count"]) for category, entry in categories.items()],
+            columns=["category", "count"]
+        ),
+    }
+    
+    return metrics
+
+# Representative query shapes checked by the EXPLAIN plan check
+def plan_check_queries(dialect):
+    return [
+        ("Listing: all categories, sort by price",) + build_product_page_query("All", (0.0, 2000.0), "price", False, None, 50, dialect),
+        ("Listing: one category, sort by name",) + build_product_page_query("Electronics", (0.0, 2000.0), "name", False, None, 50, dialect),
+        ("Listing: one category, sort by price",) + build_product_page_query("Electronics", (0.0, 2000.0), "price", False, None, 50, dialect),
+        ("Listing: one category, next page by inventory",) + build_product_page_query("Electronics", (0.0, 2000.0), "inventory", False, (10, 1000), 50, dialect),
+        ("Listing: next page by inventory desc",) + build_product_page_query("All", (0.0, 2000.0), "inventory", True, (10, 1000), 50, dialect),
+        ("Listing: sort by category",) + build_product_page_query("All", (0.0, 2000.0), "category", False, None, 50, dialect),
+        ("Listing: next page by category desc",) + build_product_page_query("All", (0.0, 2000.0), "category", True, ("Books", 1000), 50, dialect),
+        ("Category list", "SELECT DISTINCT category FROM products", {}),
+        ("Dashboard summary", METRICS_SUMMARY_QUERY, {}),
+    ]
+
+# Run EXPLAIN on the app's queries and flag full-table scans and sorts
+# that spill to a temporary table instead of reading an index in order
+SQLITE_FULL_SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?\w+$")
+SQLITE_INDEX_PATTERN = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+SQLITE_TEMP_SORT_PATTERN = re.compile(r"USE TEMP B-TREE")
+MYSQL_TEMP_SORT_MARKERS = ("Using filesort", "Using temporary")
+
+def check_query_plans():
+    engine = init_connection()
+    if engine is None:
+        return pd.DataFrame()
     
-    # Total inventory value
-    query = "SELECT SUM(price * inventory) as value FROM products"
-    result = run_query(query)
-    metrics['total_value'] = result['value'].iloc[0] if result is not None and not result.empty else 0
+    rows = []
+    for label, query, params in plan_check_queries(engine.dialect.name):
+        if engine.dialect.name == "sqlite":
+            plan = fetch_query(f"EXPLAIN QUERY PLAN {query}", params)
+            if plan is None:
+                continue
+            for detail in plan["detail"]:
+                index = SQLITE_INDEX_PATTERN.search(detail)
+                rows.append({
+                    "query": label,
+                    "table": None,
+                    "access": detail,
+                    "index": index.group(1) if index else None,
+                    "rows": None,
+                    "extra": None,
+                    "full_scan": bool(SQLITE_FULL_SCAN_PATTERN.match(detail)),
+                    "temp_sort": bool(SQLITE_TEMP_SORT_PATTERN.search(detail)),
+                })
+        else:
+            plan = fetch_query(f"EXPLAIN {query}", params)
+            if plan is None:
+                continue
+            for step in plan.to_dict("records"):
+                rows.append({
+                    "query": label,
+                    "table": step.get("table"),
+                    "access": step.get("type"),
+                    "index": step.get("key"),
+                    "rows": step.get("rows"),
+                    "extra": step.get("Extra"),
+                    "full_scan": step.get("type") == "ALL",
+                    "temp_sort": any(marker in (step.get("Extra") or "") for marker in MYSQL_TEMP_SORT_MARKERS),
+                })
+    return pd.DataFrame(rows)
+
+# Admin-only tools in the sidebar
+def admin_tools():
+    if not st.session_state.is_admin:
+        return
     
-    # Low stock products (less than 10)
-    query = "SELECT COUNT(*) as low_stock FROM products WHERE inventory < 10"
-    result = run_query(query)
-    metrics['low_stock'] = result['low_stock'].iloc[0] if result is not None and not result.empty else 0
+    with st.sidebar.expander("🛠 Query Plan Check"):
+        st.caption("Runs EXPLAIN on the app's queries. Small tables may still be scanned by choice.")
+        if st.button("Run EXPLAIN check", use_container_width=True):
+            plans = check_query_plans()
+            if plans.empty:
+                show_info("No plans returned.")
+            else:
+                full_scans = plans[plans["full_scan"]]
+                temp_sorts = plans[plans["temp_sort"]]
+                if full_scans.empty and temp_sorts.empty:
+                    show_success("No full-table scans or temporary sorts found.")
+                if not full_scans.empty:
+                    show_error(f"{full_scans['query'].nunique()} query shape(s) use a full-table scan.")
+                if not temp_sorts.empty:
+                    show_error(f"{temp_sorts['query'].nunique()} query shape(s) sort in a temporary table.")
+                st.dataframe(plans, use_container_width=True)
     
-    # Category distribution
-    query = "SELECT category, COUNT(*) as count FROM products GROUP BY category"
-    metrics['categories'] = run_query(query)
+    with st.sidebar.expander("🔌 Connection Pool"):
+        st.caption(f"Backend URL: {engine_url_for_display()}")
+        st.json(pool_statistics())
     
-    return metrics
+    with st.sidebar.expander("📈 Performance"):
+        st.caption("Rerun latency per page")
+        st.dataframe(rerun_performance_table(), hide_index=True, use_container_width=True)
+        st.caption("Database statements (latency excludes cache hits)")
+        st.dataframe(
+            query_performance_table().sort_values("p99_ms", ascending=False),
+            column_config={
+                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.2f"),
+                "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.2f"),
+                "avg_rows": st.column_config.NumberColumn("Avg rows", format="%.1f"),
+                "cache_hit_rate": st.column_config.NumberColumn("Cache hit rate", format="%.2f"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            "Download Prometheus metrics",
+            render_prometheus_metrics(),
+            file_name="inventory_metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
 
 # Product management page
 def product_management():
@@ -333,11 +1316,15 @@ def product_management():
     with col2:
         st.markdown('<div class="logout-btn">', unsafe_allow_html=True)
         if st.button("Logout"):
+            st.session_state.session_token = None
             st.session_state.authenticated = False
             st.session_state.username = None
+            st.session_state.is_admin = False
             st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
     
+    admin_tools()
+    
     # Welcome message with username and login time
     st.markdown(f'<h3 class="welcome-header">Welcome, {st.session_state.username}! | Login time: {st.session_state.login_time}</h3>', unsafe_allow_html=True)
     
@@ -354,7 +1341,7 @@ def product_management():
         st.metric("Low Stock Items", metrics['low_stock'])
     
     # Tabs for different sections
-    tab1, tab2 = st.tabs(["📋 Product Inventory", "➕ Add New Product"])
+    tab1, tab2, tab3 = st.tabs(["📋 Product Inventory", "➕ Add New Product", "📦 Bulk Import"])
     
     # Tab 1: Product Inventory
     with tab1:
@@ -383,31 +1370,46 @@ def product_management():
                 )
                 
             # Sort options
-            sort_col, sort_dir = st.columns(2)
+            sort_col, sort_dir, size_col = st.columns(3)
             with sort_col:
-                sort_by = st.selectbox("Sort by", ["id", "name", "price", "inventory", "category"])
+                sort_by = st.selectbox("Sort by", SORT_COLUMNS)
             with sort_dir:
                 sort_direction = st.selectbox("Order", ["Ascending", "Descending"])
+            with size_col:
+                page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, index=1)
         
-        # Build query based on filters
-        query = "SELECT * FROM products WHERE 1=1"
-        params = {}
+        # Restart from the first page whenever the filters or sort change
+        listing_signature = (selected_category, price_range, sort_by, sort_direction, page_size)
+        if st.session_state.get("listing_signature") != listing_signature:
+            st.session_state.listing_signature = listing_signature
+            st.session_state.page_cursors = [None]
         
-        if selected_category != "All":
-            query += " AND category = :category"
-            params["category"] = selected_category
-        
-        query += " AND price BETWEEN :min_price AND :max_price"
-        params["min_price"] = price_range[0]
-        params["max_price"] = price_range[1]
-        
-        # Add sorting
-        sort_direction_sql = "DESC" if sort_direction == "Descending" else "ASC"
-        query += f" ORDER BY {sort_by} {sort_direction_sql}"
+        # Build keyset query for the current page
+        descending = sort_direction == "Descending"
+        query, params = build_product_page_query(
+            selected_category,
+            price_range,
+            sort_by,
+            descending,
+            st.session_state.page_cursors[-1],
+            page_size,
+            database_dialect()
+        )
         
         # Display filtered products
-        products = run_query(query, params)
+        products = load_product_page(query, params, page_size)
         if products is not None and not products.empty:
+            has_next_page = len(products) > page_size
+            products = products.head(page_size)
+            last_row = products.iloc[-1]
+            sort_key = last_row[sort_by]
+            # Bind plain Python values, not numpy scalars or NaN, in the seek predicate
+            if pd.isna(sort_key):
+                sort_key = None
+            elif hasattr(sort_key, "item"):
+                sort_key = sort_key.item()
+            next_cursor = (sort_key, int(last_row["id"]))
+            
             # Format price with dollar sign
             products['price'] = products['price'].apply(lambda x: f"${x:,.2f}")
             
@@ -437,6 +1439,27 @@ def product_management():
                 height=400,
                 use_container_width=True
             )
+            
+            # Page controls
+            page_number = len(st.session_state.page_cursors)
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                st.button(
+                    "◀ Previous",
+                    on_click=go_to_previous_page,
+                    disabled=page_number == 1,
+                    use_container_width=True
+                )
+            with page_col:
+                st.caption(f"Page {page_number} · showing {len(products)} products")
+            with next_col:
+                st.button(
+                    "Next ▶",
+                    on_click=go_to_next_page,
+                    args=(next_cursor,),
+                    disabled=not has_next_page,
+                    use_container_width=True
+                )
         else:
             show_info("No products found with the current filters.")
     
@@ -444,6 +1467,11 @@ def product_management():
     with tab2:
         st.markdown('<h2 class="sub-header">Add New Product</h2>', unsafe_allow_html=True)
         
+        # Confirmation carried over from the rerun after an insert
+        flash_message = st.session_state.pop("flash_message", None)
+        if flash_message:
+            show_success(flash_message)
+        
         with st.form("new_product_form"):
             col1, col2 = st.columns(2)
             
@@ -479,32 +1507,87 @@ def product_management():
                             "price": price, 
                             "inventory": inventory
                         }):
-                            show_success("Product added successfully!")
-                            # Clear cache to reflect new data
-                            st.cache_data.clear()
-                            time.sleep(1)
+                            st.session_state.flash_message = "Product added successfully!"
                             st.rerun()
                 else:
                     show_error("Please fill all required fields")
     
+    # Tab 3: Bulk Import
+    with tab3:
+        st.markdown('<h2 class="sub-header">Bulk Import</h2>', unsafe_allow_html=True)
+        show_info("Upload a CSV or Parquet file with <b>name</b> and <b>price</b> columns, plus optional <b>category</b> and <b>inventory</b>.")
+        
+        uploaded_file = st.file_uploader("Product file", type=["csv", "parquet"])
+        if uploaded_file is not None and st.button("Import Products", use_container_width=True):
+            progress = st.progress(0.0, text="Starting import...")
+            imported = 0
+            rejected = 0
+            started = time.perf_counter()
+            
+            try:
+                for chunk, fraction in read_product_chunks(uploaded_file):
+                    rows, chunk_rejected = validate_product_chunk(chunk)
+                    rejected += chunk_rejected
+                    if rows and not import_product_chunk(rows):
+                        break
+                    imported += len(rows)
+                    rate = imported / max(time.perf_counter() - started, 1e-9)
+                    progress.progress(fraction, text=f"Imported {imported:,} rows ({rate:,.0f} rows/s)")
+                else:
+                    elapsed = time.perf_counter() - started
+                    progress.progress(1.0, text="Import complete")
+                    show_success(
+                        f"Imported {imported:,} products in {elapsed:.1f}s "
+                        f"({imported / max(elapsed, 1e-9):,.0f} rows/s). Rejected {rejected:,} invalid rows."
+                    )
+            except Exception as e:
+                show_error(f"Import error: {e}")
+    
     # Add footer
     st.markdown('<div class="footer">© 2025 Inventory Manager Pro. All rights reserved.</div>', unsafe_allow_html=True)
 
 # Main app
 def main():
     # Initialize session state for authentication
+    if "session_token" not in st.session_state:
+        st.session_state.session_token = None
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
     if "username" not in st.session_state:
         st.session_state.username = None
     if "login_time" not in st.session_state:
         st.session_state.login_time = None
+    if "is_admin" not in st.session_state:
+        st.session_state.is_admin = False
+    
+    # Fresh memo for identical reads within this rerun
+    st.session_state.query_memo = {}
+    
+    # Apply schema migrations once per process
+    try:
+        ensure_database()
+    except RuntimeError:
+        st.stop()
+    
+    # Validate the signed session token in memory, without a database lookup
+    session = validate_session_token(st.session_state.session_token)
+    st.session_state.authenticated = session is not None
+    if session is not None:
+        st.session_state.username = session["username"]
+        st.session_state.is_admin = session["is_admin"]
+        st.session_state.login_time = session["login_time"]
     
     # Display appropriate page based on authentication status
-    if not st.session_state.authenticated:
-        login_page()
-    else:
-        product_management()
+    page = "product_management" if st.session_state.authenticated else "login_page"
+    started = time.perf_counter()
+    try:
+        if not st.session_state.authenticated:
+            login_page()
+        else:
+            product_management()
+    finally:
+        record_rerun(page, time.perf_counter() - started)
+        export_prometheus_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,397 @@
+"""Concurrent-session load test for the Inventory Manager app.
+
+Starts one real `streamlit run` server for app.py against a throwaway SQLite
+database and drives it over the websocket protocol the browser uses.
+--concurrency sessions are connected at the same time, so they share the
+server's caches, database connection pool and password-hashing pool the way
+real users of one app server do; --sessions is the total number of sessions
+run. Each session logs in, changes the filters and sort order, and adds a
+product.
+
+Rerun latency is measured by the client, from sending a rerun to the
+server's final script_finished message, so it includes queueing inside the
+server. Reads and database statements per rerun come from the app's own
+counters (exported through PERF_METRICS_FILE), and memory is the server
+process's RSS after warm-up and at its peak.
+
+    python 5/load_test.py --sessions 200 --concurrency 50
+    python 5/load_test.py --sessions 400 --concurrency 200 --max-p99-ms 1500 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import DoubleArray
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STEPS = ["open", "login", "filter_category", "filter_price", "sort", "insert"]
+SERVER_START_TIMEOUT = 60
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, env, log_file):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true",
+         f"--server.port={port}",
+         "--server.address", "127.0.0.1",
+         # The harness is not a browser and has no XSRF cookie
+         "--server.enableXsrfProtection", "false",
+         "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.read() == b"ok":
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"streamlit did not become healthy within {SERVER_START_TIMEOUT}s")
+
+
+# Current resident memory of the server, or None where /proc is unavailable
+def server_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Totals of the app's exported counters, summed over all label sets
+def read_server_counters(metrics_file):
+    totals = {"reruns": 0.0, "reads": 0.0, "statements": 0.0}
+    names = {
+        "inventory_rerun_duration_seconds_count": "reruns",
+        "inventory_query_cache_hits_total": "reads",
+        "inventory_query_cache_misses_total": "reads",
+        "inventory_query_duration_seconds_count": "statements",
+    }
+    with open(metrics_file) as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            name = line.split("{", 1)[0].split(" ", 1)[0]
+            if name in names:
+                totals[names[name]] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+def find_widget(elements, kind, label, occurrence=0):
+    matches = [proto for element_kind, proto in elements if element_kind == kind and proto.label == label]
+    if len(matches) <= occurrence:
+        raise LookupError(f"No {kind} labelled {label!r}")
+    return matches[occurrence]
+
+
+def select_option(proto, option):
+    if option not in proto.options:
+        raise LookupError(f"{proto.label!r} has no option {option!r}")
+    return WidgetState(id=proto.id, string_value=option)
+
+
+# One browser tab: a websocket session on the server. The server keeps each
+# session's widget values between reruns, so a rerun only sends the widgets
+# the user changed, as the browser does.
+class SessionClient:
+    def __init__(self, port, timeout):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.timeout = timeout
+        self.ws = None
+        self.elements = []
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def rerun(self, widget_states=()):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.ws.send(msg.SerializeToString())
+        self.elements = await asyncio.wait_for(self._read_run(), self.timeout)
+        errors = [proto.message for kind, proto in self.elements if kind == "exception"]
+        if errors:
+            raise RuntimeError(errors[0])
+
+    async def _read_run(self):
+        elements = []
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.ws.recv())
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_kind = element.WhichOneof("type")
+                elements.append((element_kind, getattr(element, element_kind)))
+            elif kind == "script_finished":
+                # st.rerun() ends the run early and starts another one
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    elements = []
+                    continue
+                return elements
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {step: [] for step in STEPS}
+        self.errors = []
+
+    async def run_step(self, client, step, widget_states=()):
+        started = time.perf_counter()
+        try:
+            await client.rerun(widget_states)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"{step}: no response within {client.timeout:.0f}s")
+        except Exception as e:
+            raise RuntimeError(f"{step}: {e}")
+        self.samples[step].append(time.perf_counter() - started)
+
+
+async def run_session(session_id, recorder, args):
+    async with SessionClient(args.port, args.timeout) as client:
+        await recorder.run_step(client, "open")
+
+        elements = client.elements
+        await recorder.run_step(client, "login", [
+            WidgetState(id=find_widget(elements, "text_input", "Username").id, string_value=args.username),
+            WidgetState(id=find_widget(elements, "text_input", "Password").id, string_value=args.password),
+            WidgetState(id=find_widget(elements, "button", "Login").id, trigger_value=True),
+        ])
+        # The login rerun itself reruns into the product page
+        if not any(kind == "button" and proto.label == "Logout" for kind, proto in client.elements):
+            raise RuntimeError("login: still on the sign-in page")
+
+        category = find_widget(client.elements, "selectbox", "Category")
+        states = []
+        if len(category.options) > 1:
+            states.append(select_option(category, category.options[1 + session_id % (len(category.options) - 1)]))
+        await recorder.run_step(client, "filter_category", states)
+
+        price = find_widget(client.elements, "slider", "Price Range ($)")
+        await recorder.run_step(client, "filter_price", [
+            WidgetState(id=price.id, double_array_value=DoubleArray(data=[50.0, 1500.0])),
+        ])
+
+        elements = client.elements
+        await recorder.run_step(client, "sort", [
+            select_option(find_widget(elements, "selectbox", "Sort by"),
+                          ["name", "price", "inventory", "category"][session_id % 4]),
+            select_option(find_widget(elements, "selectbox", "Order"), "Descending"),
+        ])
+
+        elements = client.elements
+        states = [
+            WidgetState(id=find_widget(elements, "text_input", "Product Name").id,
+                        string_value=f"Load test product {session_id}"),
+            WidgetState(id=find_widget(elements, "number_input", "Price ($)").id, double_value=9.99),
+            WidgetState(id=find_widget(elements, "number_input", "Initial Inventory").id,
+                        double_value=session_id % 20),
+            WidgetState(id=find_widget(elements, "button", "Add Product").id, trigger_value=True),
+        ]
+        form_category = find_widget(elements, "selectbox", "Category", occurrence=1)
+        if len(form_category.options) > 1:
+            states.append(select_option(form_category, form_category.options[1]))
+        await recorder.run_step(client, "insert", states)
+
+
+async def run_load(recorder, args):
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def one(session_id):
+        async with limit:
+            try:
+                await run_session(session_id, recorder, args)
+            except Exception as e:
+                recorder.errors.append(f"session {session_id}: {e}")
+
+    await asyncio.gather(*(one(session_id) for session_id in range(1, args.sessions + 1)))
+
+
+# The app writes its metrics at the end of a rerun once the export interval
+# has passed; wait it out and rerun once so the file is current
+async def flush_server_counters(args):
+    await asyncio.sleep(args.export_interval + 0.5)
+    async with SessionClient(args.port, args.timeout) as client:
+        await client.rerun()
+    return read_server_counters(args.metrics_file)
+
+
+def build_report(recorder, args, wall_seconds, client_cpu_seconds, counters, idle_rss_mb, peak_rss_mb):
+    steps = {}
+    for step, samples in recorder.samples.items():
+        steps[step] = {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "max_ms": max(samples, default=0.0) * 1000,
+        }
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    # Server-side reruns include the st.rerun() after login and the final
+    # flush rerun, so they outnumber the client's steps
+    server_reruns = counters["reruns"]
+
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "wall_seconds": wall_seconds,
+        "client_cpu_seconds": client_cpu_seconds,
+        "steps_run": len(all_samples),
+        "steps_per_second": len(all_samples) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": percentile(all_samples, 0.50) * 1000,
+        "p99_ms": percentile(all_samples, 0.99) * 1000,
+        "server_reruns": int(server_reruns),
+        "reads_per_rerun": counters["reads"] / server_reruns if server_reruns else 0.0,
+        "db_statements_per_rerun": counters["statements"] / server_reruns if server_reruns else 0.0,
+        "server_idle_rss_mb": idle_rss_mb,
+        "server_peak_rss_mb": peak_rss_mb,
+        "steps": steps,
+        "errors": recorder.errors,
+    }
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions, {report['concurrency']} concurrent, against one server: "
+          f"{report['steps_run']} steps in {report['wall_seconds']:.1f}s "
+          f"({report['steps_per_second']:.1f} steps/s)")
+    print(f"{'step':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, stats in report["steps"].items():
+        print(f"{step:<16}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+    print(f"overall p50 {report['p50_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+    print(f"server: {report['server_reruns']} reruns, reads per rerun {report['reads_per_rerun']:.2f}, "
+          f"db statements per rerun {report['db_statements_per_rerun']:.2f}")
+    idle = report["server_idle_rss_mb"]
+    print(f"server RSS after warm-up {idle:.1f} MB, " if idle is not None else "server RSS ", end="")
+    print(f"peak {report['server_peak_rss_mb']:.1f} MB")
+    # A saturated client inflates latencies with its own queueing
+    if report["client_cpu_seconds"] > 0.8 * report["wall_seconds"]:
+        print(f"warning: the load generator used {report['client_cpu_seconds']:.1f}s of CPU in "
+              f"{report['wall_seconds']:.1f}s; latencies include client-side delay", file=sys.stderr)
+    if report["errors"]:
+        print(f"{len(report['errors'])} session(s) failed:")
+        for error in report["errors"][:20]:
+            print(f"  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100, help="simulated user sessions in total")
+    parser.add_argument("--concurrency", type=int, default=50, help="sessions connected at the same time")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temporary file)")
+    parser.add_argument("--hash-iterations", type=int, help="override PASSWORD_HASH_ITERATIONS")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per rerun")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero if overall p99 exceeds this")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.TemporaryDirectory()
+    args.port = free_port()
+    args.metrics_file = os.path.join(temp_dir.name, "metrics.prom")
+    args.export_interval = 1
+
+    # The server inherits the app's configuration through the environment
+    env = dict(os.environ)
+    env["DB_BACKEND"] = "sqlite"
+    env["SQLITE_PATH"] = args.database or os.path.join(temp_dir.name, "load_test.db")
+    env.pop("DATABASE_URL", None)
+    env["PERF_METRICS_FILE"] = args.metrics_file
+    env["PERF_EXPORT_INTERVAL_SECONDS"] = str(args.export_interval)
+    if args.hash_iterations:
+        env["PASSWORD_HASH_ITERATIONS"] = str(args.hash_iterations)
+
+    log_path = os.path.join(temp_dir.name, "server.log")
+    log_file = open(log_path, "w")
+    server = None
+    try:
+        server = start_server(args.port, env, log_file)
+
+        # Warm up once so migrations, seeding and imports are not measured
+        warmup = Recorder()
+        try:
+            asyncio.run(run_session(0, warmup, args))
+        except Exception as e:
+            print(f"Warm-up session failed: {e}", file=sys.stderr)
+            return 2
+        before = asyncio.run(flush_server_counters(args))
+        idle_rss_mb = server_rss_mb(server.pid)
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        asyncio.run(run_load(recorder, args))
+        wall_seconds = time.perf_counter() - started
+        client_cpu_seconds = time.process_time() - cpu_started
+
+        after = asyncio.run(flush_server_counters(args))
+        counters = {key: after[key] - before[key] for key in after}
+    except Exception:
+        log_file.flush()
+        with open(log_path) as f:
+            print("".join(f.readlines()[-40:]), file=sys.stderr)
+        raise
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        log_file.close()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    report = build_report(recorder, args, wall_seconds, client_cpu_seconds, counters, idle_rss_mb, peak_rss_mb)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    temp_dir.cleanup()
+    if report["errors"]:
+        return 1
+    if args.max_p99_ms is not None and report["p99_ms"] > args.max_p99_ms:
+        print(f"p99 {report['p99_ms']:.1f} ms exceeds the {args.max_p99_ms:.1f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
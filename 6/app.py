@@ -2,48 +2,450 @@ import streamlit as st
 import cv2
 import numpy as np
 from PIL import Image
+import bisect
+import collections
+import json
+import os
+import threading
+import time
+import tempfile
+from frame_batch import DEFAULT_CHUNK_FRAMES, process_video
+from frame_filters import FILTERS, new_filter_chain, run_filter_chain
+from frame_sources import SOURCE_KINDS, is_realtime, open_source, source_fps
 
-st.title("Real-Time Webcam Filters with OpenCV")
-
-# Filter controls
-threshold1 = st.slider("Canny Threshold 1", 50, 300, 100)
-threshold2 = st.slider("Canny Threshold 2", 50, 300, 150)
-filter_type = st.selectbox("Choose Filter", ["None", "Canny Edge", "Gray", "Blur"])
-
-# Start webcam
-cap = cv2.VideoCapture(0)
-stframe = st.empty()
-
-# Snapshot button
-snapshot = st.button("Take Snapshot")
-
-if cap.isOpened():
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            st.write("Camera not available.")
-            break
-
-        # Apply filter
-        if filter_type == "Gray":
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        elif filter_type == "Canny Edge":
-            frame = cv2.Canny(frame, threshold1, threshold2)
-        elif filter_type == "Blur":
-            frame = cv2.GaussianBlur(frame, (15, 15), 0)
-
-        # Convert for display
-        if len(frame.shape) == 2:
-            frame_display = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+# Frames held between the capture thread and the display loop. Kept small
+# so a slow display drops stale frames instead of falling behind.
+FRAME_BUFFER_SIZE = int(os.getenv("FRAME_BUFFER_SIZE", "2"))
+FRAME_WAIT_SECONDS = 1.0
+STATS_EVERY_FRAMES = 30
+
+# Output encoding. Frames go to the browser as JPEG bytes; widths above
+# Streamlit's content width would be re-encoded by Streamlit itself.
+OUTPUT_WIDTHS = [1280, 960, 640, 480, 320]
+DEFAULT_JPEG_QUALITY = 80
+DEFAULT_TARGET_FPS = 15
+MIN_JPEG_QUALITY = 40
+JPEG_QUALITY_STEP = 10
+MIN_OUTPUT_SCALE = 0.4
+OUTPUT_SCALE_STEP = 0.8
+MIN_OUTPUT_FPS = 2.0
+COST_EWMA_ALPHA = 0.2
+ADJUST_EVERY_FRAMES = 15
+
+# Frame timing. "queue" is the wait between capture and the display loop
+# picking a frame up; "latency" runs from capture to the end of the push.
+TIMING_STAGES = ["capture", "queue", "filter", "encode", "display", "latency"]
+# These span several frames' work and overlap each other, so they are
+# traced as async begin/end pairs rather than nested slices
+ASYNC_TRACE_STAGES = {"queue", "latency"}
+TIMING_SAMPLE_SIZE = int(os.getenv("FRAME_TIMING_SAMPLES", "300"))
+TRACE_MAX_EVENTS = 50000
+TRACE_PATH = os.getenv("FRAME_TRACE_PATH", "frame_trace.json")
+HISTOGRAM_BOUNDS_MS = [1, 2, 4, 8, 16, 33, 66]
+
+# Fixed-size ring buffer shared by the capture thread (producer) and the
+# display loop (consumer). Pushing into a full ring overwrites the oldest
+# frame; taking a frame returns the newest and discards the rest.
+def new_frame_ring(capacity=FRAME_BUFFER_SIZE):
+    return {
+        "cond": threading.Condition(),
+        "frames": collections.deque(maxlen=capacity),
+        "captured": 0,
+        "processed": 0,
+        "dropped": 0,
+        "closed": False,
+        "error": None,
+    }
+
+def push_frame(ring, frame):
+    with ring["cond"]:
+        if len(ring["frames"]) == ring["frames"].maxlen:
+            ring["dropped"] += 1
+        ring["frames"].append(frame)
+        ring["captured"] += 1
+        ring["cond"].notify()
+
+def close_ring(ring, error=None):
+    with ring["cond"]:
+        ring["closed"] = True
+        ring["error"] = error
+        ring["cond"].notify_all()
+
+# Newest (frame, captured_at), or None if nothing arrived within the
+# timeout or the source has closed and the ring is empty
+def take_latest_frame(ring, timeout=FRAME_WAIT_SECONDS):
+    with ring["cond"]:
+        ring["cond"].wait_for(lambda: ring["frames"] or ring["closed"], timeout)
+        if not ring["frames"]:
+            return None
+        frame = ring["frames"].pop()
+        ring["dropped"] += len(ring["frames"])
+        ring["frames"].clear()
+        ring["processed"] += 1
+        return frame
+
+def ring_stats(ring):
+    with ring["cond"]:
+        return {key: ring[key] for key in ("captured", "processed", "dropped")}
+
+# Per-stage timings for a session. Each stage keeps a rolling window of
+# durations; every sample is also stored as an event for a Chrome trace,
+# viewable in chrome://tracing or ui.perfetto.dev.
+def new_frame_timings(sample_size=TIMING_SAMPLE_SIZE):
+    return {
+        "lock": threading.Lock(),
+        "stages": {stage: collections.deque(maxlen=sample_size) for stage in TIMING_STAGES},
+        "shown": collections.deque(maxlen=sample_size),
+        "trace": collections.deque(maxlen=TRACE_MAX_EVENTS),
+        "threads": {},
+        "span_id": 0,
+        "origin": time.perf_counter(),
+    }
+
+# Trace lanes are per thread name: thread idents are reused across reruns
+def record_stage(timings, stage, started, finished):
+    thread_name = threading.current_thread().name
+    with timings["lock"]:
+        timings["stages"][stage].append(finished - started)
+        tid = timings["threads"].setdefault(thread_name, len(timings["threads"]) + 1)
+        event = {"name": stage, "pid": os.getpid(), "tid": tid, "ts": (started - timings["origin"]) * 1e6}
+        if stage in ASYNC_TRACE_STAGES:
+            timings["span_id"] += 1
+            event.update(cat="frame", id=timings["span_id"])
+            timings["trace"].append(dict(event, ph="b"))
+            timings["trace"].append(dict(event, ph="e", ts=(finished - timings["origin"]) * 1e6))
+        else:
+            timings["trace"].append(dict(event, ph="X", dur=(finished - started) * 1e6))
+
+def record_frame_shown(timings, shown_at):
+    with timings["lock"]:
+        timings["shown"].append(shown_at)
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def display_fps(timings):
+    with timings["lock"]:
+        shown = list(timings["shown"])
+    if len(shown) < 2 or shown[-1] == shown[0]:
+        return 0.0
+    return (len(shown) - 1) / (shown[-1] - shown[0])
+
+# Percentiles and a histogram (sample counts per duration bucket) for each
+# stage over its rolling window
+def stage_table(timings):
+    with timings["lock"]:
+        stages = {stage: list(samples) for stage, samples in timings["stages"].items()}
+    labels = [f"<={bound} ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]} ms"]
+    rows = []
+    for stage, samples in stages.items():
+        buckets = [0] * len(labels)
+        for sample in samples:
+            buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, sample * 1000)] += 1
+        rows.append({
+            "stage": stage,
+            "p50 ms": round(percentile(samples, 0.50) * 1000, 2),
+            "p95 ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99 ms": round(percentile(samples, 0.99) * 1000, 2),
+            "max ms": round(max(samples, default=0.0) * 1000, 2),
+            **dict(zip(labels, buckets)),
+        })
+    return rows
+
+def timing_overlay(timings):
+    with timings["lock"]:
+        latency = list(timings["stages"]["latency"])
+    return f"{display_fps(timings):.1f} fps  {percentile(latency, 0.5) * 1000:.0f} ms latency"
+
+def dump_trace(timings, path=TRACE_PATH):
+    with timings["lock"]:
+        events = list(timings["trace"])
+        threads = dict(timings["threads"])
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+        for name, tid in threads.items()
+    ]
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    os.replace(temp_path, path)
+    return len(events)
+
+# Producer: reads the source as fast as it delivers, never waiting on
+# display. Sources that are not real time are paced to `interval` seconds
+# per frame so they play at their own speed. Frames are queued with their
+# capture time. For a camera the "capture" stage includes waiting for the
+# next frame, so it reads close to the camera's frame interval.
+def capture_frames(cap, ring, stop, timings, interval=0.0, end_message="Camera not available."):
+    error = None
+    next_frame = time.perf_counter()
+    try:
+        while not stop.is_set():
+            read_started = time.perf_counter()
+            ret, frame = cap.read()
+            captured_at = time.perf_counter()
+            if not ret:
+                error = end_message
+                break
+            record_stage(timings, "capture", read_started, captured_at)
+            push_frame(ring, (frame, captured_at))
+            if interval:
+                next_frame += interval
+                stop.wait(max(0.0, next_frame - time.perf_counter()))
+    except cv2.error as e:
+        error = str(e)
+    finally:
+        close_ring(ring, error)
+
+# JPEG straight from the BGR or single-channel frame; imencode takes both,
+# so there is no RGB conversion and Streamlit passes the bytes through.
+# `overlay` text is drawn on the output only, never on the caller's frame.
+def encode_frame(frame, quality, max_width, scale=1.0, overlay=None):
+    height, width = frame.shape[:2]
+    out_width = int(min(width, max_width) * scale)
+    if out_width < width:
+        out_height = max(1, round(height * out_width / width))
+        frame = cv2.resize(frame, (out_width, out_height), interpolation=cv2.INTER_AREA)
+    elif overlay:
+        frame = frame.copy()
+    if overlay:
+        color = (0, 255, 0) if frame.ndim == 3 else 255
+        cv2.putText(frame, overlay, (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise cv2.error("JPEG encoding failed")
+    return buffer.tobytes()
+
+# Adaptive output control. The cost of each frame (encode plus push to the
+# browser) is smoothed with an EWMA and compared with the frame budget of
+# the target FPS. Over budget, the controller lowers JPEG quality, then
+# resolution, then the output frame rate; well under budget it restores
+# them in reverse order. Changes are at least ADJUST_EVERY_FRAMES apart.
+def new_encode_controller(quality, target_fps, adaptive=True):
+    return {
+        "adaptive": adaptive,
+        "max_quality": quality,
+        "target_fps": float(target_fps),
+        "quality": quality,
+        "scale": 1.0,
+        "fps": float(target_fps),
+        "cost": None,
+        "frames_since_change": 0,
+    }
+
+def record_frame_cost(controller, seconds):
+    if controller["cost"] is None:
+        controller["cost"] = seconds
+    else:
+        controller["cost"] += COST_EWMA_ALPHA * (seconds - controller["cost"])
+    controller["frames_since_change"] += 1
+    if controller["adaptive"] and controller["frames_since_change"] >= ADJUST_EVERY_FRAMES:
+        adjust_encoding(controller)
+
+def adjust_encoding(controller):
+    budget = 1.0 / controller["target_fps"]
+    cost = controller["cost"]
+    if cost > budget:
+        if controller["quality"] > MIN_JPEG_QUALITY:
+            controller["quality"] = max(MIN_JPEG_QUALITY, controller["quality"] - JPEG_QUALITY_STEP)
+        elif controller["scale"] > MIN_OUTPUT_SCALE:
+            controller["scale"] = max(MIN_OUTPUT_SCALE, controller["scale"] * OUTPUT_SCALE_STEP)
+        elif controller["fps"] > MIN_OUTPUT_FPS and cost > 1.0 / controller["fps"]:
+            # Cannot get cheaper: pace output a little below what the
+            # server sustains
+            controller["fps"] = max(MIN_OUTPUT_FPS, OUTPUT_SCALE_STEP / cost)
         else:
-            frame_display = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            return
+    elif controller["fps"] < controller["target_fps"]:
+        controller["fps"] = min(controller["target_fps"], controller["fps"] / OUTPUT_SCALE_STEP)
+    elif cost < budget * 0.5:
+        if controller["scale"] < 1.0:
+            controller["scale"] = min(1.0, controller["scale"] / OUTPUT_SCALE_STEP)
+        elif controller["quality"] < controller["max_quality"]:
+            controller["quality"] = min(controller["max_quality"], controller["quality"] + JPEG_QUALITY_STEP)
+        else:
+            return
+    else:
+        return
+    controller["frames_since_change"] = 0
+
+# Live preview from the selected source
+def live_view(filter_names, filter_params):
+    # Source controls
+    st.sidebar.header("Source")
+    source_kind = st.sidebar.selectbox("Frame source", SOURCE_KINDS)
+    location = None
+    if source_kind == "Webcam":
+        location = st.sidebar.number_input("Camera index", min_value=0, value=0, step=1)
+    elif source_kind in ("Video file", "Image directory"):
+        location = st.sidebar.text_input("Path")
+        if not location:
+            st.info(f"Enter the {source_kind.lower()} path in the sidebar.")
+            return
+
+    # Output controls
+    st.sidebar.header("Output")
+    max_width = st.sidebar.selectbox("Max width (px)", OUTPUT_WIDTHS, index=OUTPUT_WIDTHS.index(640))
+    quality = st.sidebar.slider("JPEG quality", MIN_JPEG_QUALITY, 95, DEFAULT_JPEG_QUALITY)
+    target_fps = st.sidebar.slider("Target FPS", 5, 30, DEFAULT_TARGET_FPS)
+    adaptive = st.sidebar.checkbox("Adapt to hold target FPS", value=True)
+
+    # Timing controls; timings live for the whole session so a trace can be
+    # saved after the stream has been interrupted
+    if "frame_timings" not in st.session_state:
+        st.session_state.frame_timings = new_frame_timings()
+    timings = st.session_state.frame_timings
+    st.sidebar.header("Diagnostics")
+    show_overlay = st.sidebar.checkbox("FPS overlay")
+    show_panel = st.sidebar.checkbox("Stage timing panel", value=True)
+    if st.sidebar.button("Save trace"):
+        count = dump_trace(timings)
+        st.sidebar.success(f"Saved {count} events to {TRACE_PATH}")
+
+    stframe = st.empty()
+    stats = st.empty()
+    panel = st.empty()
+
+    # Snapshot button
+    snapshot = st.button("Take Snapshot")
+
+    # Open the source
+    try:
+        cap = open_source(source_kind, location)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if not cap.isOpened():
+        st.write("Camera not available." if source_kind == "Webcam" else f"Cannot open {location}.")
+        cap.release()
+        return
+    # Keep the driver's own queue short; the ring buffer does the buffering
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    ring = new_frame_ring()
+    controller = new_encode_controller(quality, target_fps, adaptive)
+    chain = new_filter_chain(filter_names)
+    stop = threading.Event()
+    if is_realtime(source_kind):
+        capture_args = (cap, ring, stop, timings)
+    else:
+        capture_args = (cap, ring, stop, timings, 1.0 / source_fps(cap), "End of source.")
+    capture = threading.Thread(target=capture_frames, args=capture_args, name="frame-capture", daemon=True)
+    capture.start()
+
+    overlay = None
+
+    try:
+        while True:
+            item = take_latest_frame(ring)
+            if item is None:
+                if ring["closed"]:
+                    if ring["error"]:
+                        st.write(ring["error"])
+                    break
+                continue
+            frame, captured_at = item
+
+            frame_started = time.perf_counter()
+            record_stage(timings, "queue", captured_at, frame_started)
+            frame = run_filter_chain(chain, frame, filter_params)
+            filtered_at = time.perf_counter()
+            record_stage(timings, "filter", frame_started, filtered_at)
+            jpeg = encode_frame(frame, controller["quality"], max_width, controller["scale"], overlay)
+            encoded_at = time.perf_counter()
+            record_stage(timings, "encode", filtered_at, encoded_at)
+            stframe.image(jpeg, output_format="JPEG")
+            shown_at = time.perf_counter()
+            record_stage(timings, "display", encoded_at, shown_at)
+            record_stage(timings, "latency", captured_at, shown_at)
+            record_frame_shown(timings, shown_at)
+            record_frame_cost(controller, shown_at - filtered_at)
+
+            counts = ring_stats(ring)
+            if counts["processed"] % STATS_EVERY_FRAMES == 1:
+                stats.caption(
+                    f"{display_fps(timings):.1f} fps · captured {counts['captured']} · "
+                    f"processed {counts['processed']} · dropped {counts['dropped']} · "
+                    f"JPEG q{controller['quality']} at "
+                    f"{int(min(frame.shape[1], max_width) * controller['scale'])} px · "
+                    f"{controller['fps']:.0f} fps cap · {controller['cost'] * 1000:.0f} ms/frame output"
+                )
+                if show_panel:
+                    panel.dataframe(stage_table(timings))
+                overlay = timing_overlay(timings) if show_overlay else None
+
+            # Save snapshot
+            if snapshot:
+                cv2.imwrite("snapshot.png", frame)
+                st.success("Snapshot saved as snapshot.png")
+                break
+
+            # Pace output to the controller's frame rate
+            remaining = 1.0 / controller["fps"] - (time.perf_counter() - frame_started)
+            if remaining > 0:
+                time.sleep(remaining)
+    finally:
+        # Also runs when a widget change interrupts the loop, so the next
+        # run can reopen the source
+        stop.set()
+        capture.join(timeout=FRAME_WAIT_SECONDS)
+        cap.release()
+
+# Offline processing of a recorded video with the same filter chain
+def batch_view(filter_names, filter_params):
+    st.sidebar.header("Batch")
+    workers = st.sidebar.number_input("Worker processes", min_value=1, value=os.cpu_count() or 1)
+    chunk_frames = st.sidebar.number_input("Frames per chunk", min_value=1, value=DEFAULT_CHUNK_FRAMES)
+
+    upload = st.file_uploader("Video to process", type=["mp4", "avi", "mov", "mkv"])
+    input_path = st.text_input("...or a video path on the server")
+    output_path = st.text_input("Output video", "batch_output.mp4")
+    if not st.button("Run Batch"):
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if upload is not None:
+            input_path = os.path.join(temp_dir, upload.name)
+            with open(input_path, "wb") as f:
+                f.write(upload.getbuffer())
+        if not input_path:
+            st.error("Choose a video to process.")
+            return
+
+        progress = st.progress(0.0)
+        def show_progress(done, total):
+            progress.progress(min(1.0, done / total) if total else 1.0, f"{done} / {total} frames")
+
+        try:
+            report = process_video(input_path, output_path, filter_names, filter_params,
+                                   int(workers), int(chunk_frames), show_progress)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+    st.success(
+        f"Wrote {report['frames']} frames to {report['output']} in {report['seconds']:.1f}s: "
+        f"{report['fps']:.1f} fps, {report['megapixels_per_second']:.1f} MP/s with {report['workers']} workers"
+    )
+
+def main():
+    st.title("Real-Time Webcam Filters with OpenCV")
 
-        stframe.image(frame_display, channels="RGB")
+    # Filter controls
+    threshold1 = st.slider("Canny Threshold 1", 50, 300, 100)
+    threshold2 = st.slider("Canny Threshold 2", 50, 300, 150)
+    # Filters run in the order they were picked; see frame_filters.py
+    filter_names = st.multiselect("Filter chain (applied in order)", list(FILTERS))
+    filter_params = {"threshold1": threshold1, "threshold2": threshold2}
 
-        # Save snapshot
-        if snapshot:
-            cv2.imwrite("snapshot.png", frame)
-            st.success("Snapshot saved as snapshot.png")
-            break
+    mode = st.sidebar.radio("Mode", ["Live", "Batch"])
+    if mode == "Live":
+        live_view(filter_names, filter_params)
+    else:
+        batch_view(filter_names, filter_params)
 
-    cap.release()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Micro-benchmark for the webcam filter chains.
+
+Times every filter on its own, plus a stacked chain, at common frame sizes,
+using frame_filters.py with its reused output buffers. For comparison it
+also times the allocating calls the app used before, including the gray to
+RGB conversion those did for display. Frames are synthetic, so no camera is
+needed.
+
+    python 6/bench_filters.py
+    python 6/bench_filters.py --frames 200 --chain Blur Gray "Canny Edge" --json filters.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import cv2
+
+from frame_filters import DEFAULT_PARAMS, FILTERS, new_filter_chain, run_filter_chain
+from frame_sources import synthetic_frame
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+# Allocating version of the old single-filter path, display conversion included
+def legacy_filter(frame, name, params):
+    if name == "Gray":
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    elif name == "Canny Edge":
+        frame = cv2.Canny(frame, params["threshold1"], params["threshold2"])
+    elif name == "Blur":
+        frame = cv2.GaussianBlur(frame, (15, 15), 0)
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def time_per_frame(run, frame, frames, warmup):
+    for _ in range(warmup):
+        run(frame)
+    samples = []
+    for _ in range(frames):
+        started = time.perf_counter()
+        run(frame)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def build_report(args):
+    cases = [(name, [name]) for name in FILTERS]
+    if args.chain:
+        cases.append((" > ".join(args.chain), args.chain))
+
+    results = {}
+    for label, (width, height) in RESOLUTIONS.items():
+        frame = synthetic_frame(width, height)
+        rows = {}
+        for case, names in cases:
+            chain = new_filter_chain(names)
+            row = {"chain_ms": time_per_frame(lambda f: run_filter_chain(chain, f, DEFAULT_PARAMS),
+                                              frame, args.frames, args.warmup)}
+            if len(names) == 1:
+                row["legacy_ms"] = time_per_frame(lambda f: legacy_filter(f, names[0], DEFAULT_PARAMS),
+                                                  frame, args.frames, args.warmup)
+            rows[case] = row
+        results[label] = rows
+
+    return {
+        "frames": args.frames,
+        "opencv": cv2.__version__,
+        "threads": cv2.getNumThreads(),
+        "results": results,
+    }
+
+
+def print_report(report):
+    print(f"OpenCV {report['opencv']}, {report['threads']} threads, "
+          f"median of {report['frames']} frames")
+    print(f"{'resolution':<12}{'filter':<28}{'chain ms':>10}{'legacy ms':>11}")
+    for label, rows in report["results"].items():
+        for case, row in rows.items():
+            legacy = f"{row['legacy_ms']:>11.2f}" if "legacy_ms" in row else f"{'-':>11}"
+            print(f"{label:<12}{case:<28}{row['chain_ms']:>10.2f}{legacy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100, help="timed frames per case")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed frames per case")
+    parser.add_argument("--chain", nargs="+", choices=list(FILTERS), default=["Blur", "Gray", "Canny Edge"],
+                        help="stacked chain to time as well")
+    parser.add_argument("--threads", type=int, help="cv2.setNumThreads value (default: OpenCV's)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    report = build_report(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Offline batch processing of recorded video through the webcam app's filters.
+
+The input video is split into chunks of consecutive frames. Each chunk goes
+to a worker process, which opens the file itself, seeks to the chunk's first
+frame and runs the same filter chain the live view uses. Results come back
+in order and are written to the output video while later chunks are still
+being processed; at most a few chunks per worker are held in memory.
+
+    python 6/frame_batch.py input.mp4 output.mp4 --filters Blur Gray "Canny Edge"
+    python 6/frame_batch.py input.mp4 output.mp4 --workers 8 --chunk-frames 32
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from frame_filters import DEFAULT_PARAMS, FILTERS, new_filter_chain, run_filter_chain
+
+DEFAULT_CHUNK_FRAMES = 16
+OUTPUT_FOURCC = "mp4v"
+
+def video_info(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        return {
+            "frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS) or 30.0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+# Each process uses one OpenCV thread; the pool provides the parallelism
+def init_worker():
+    cv2.setNumThreads(1)
+
+# Worker: filtered frames [start, start + count) of the video. Top-level so
+# the process pool can pickle it.
+def process_chunk(path, start, count, filter_names, params):
+    cap = cv2.VideoCapture(path)
+    chain = new_filter_chain(filter_names)
+    frames = []
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for _ in range(count):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Copy: the chain reuses its buffers on the next frame
+            frames.append(run_filter_chain(chain, frame, params).copy())
+    finally:
+        cap.release()
+    return frames
+
+def chunk_ranges(frame_count, chunk_frames):
+    return [(start, min(chunk_frames, frame_count - start)) for start in range(0, frame_count, chunk_frames)]
+
+# Filtered frames may be single-channel; the writer always gets BGR
+def write_frame(writer, frame):
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    writer.write(frame)
+
+def process_video(input_path, output_path, filter_names, params=DEFAULT_PARAMS,
+                  workers=None, chunk_frames=DEFAULT_CHUNK_FRAMES, progress=None):
+    new_filter_chain(filter_names)  # fail fast on unknown names
+    info = video_info(input_path)
+    workers = workers or os.cpu_count() or 1
+    chunks = chunk_ranges(info["frames"], chunk_frames)
+
+    started = time.perf_counter()
+    written = 0
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*OUTPUT_FOURCC), info["fps"],
+                             (info["width"], info["height"]))
+    if not writer.isOpened():
+        raise ValueError(f"Cannot write video: {output_path}")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            # Bounded window of in-flight chunks, consumed in submission order
+            pending = collections.deque()
+            next_chunk = 0
+            while pending or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and len(pending) < workers * 2:
+                    start, count = chunks[next_chunk]
+                    pending.append(executor.submit(process_chunk, input_path, start, count,
+                                                   list(filter_names), params))
+                    next_chunk += 1
+                for frame in pending.popleft().result():
+                    write_frame(writer, frame)
+                    written += 1
+                if progress:
+                    progress(written, info["frames"])
+    finally:
+        writer.release()
+
+    seconds = time.perf_counter() - started
+    return {
+        "input": input_path,
+        "output": output_path,
+        "filters": list(filter_names),
+        "workers": workers,
+        "chunk_frames": chunk_frames,
+        "frames": written,
+        "seconds": seconds,
+        "fps": written / seconds if seconds else 0.0,
+        "megapixels_per_second": written * info["width"] * info["height"] / seconds / 1e6 if seconds else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="video file to process")
+    parser.add_argument("output", help="video file to write (MPEG-4)")
+    parser.add_argument("--filters", nargs="*", choices=list(FILTERS), default=[], help="chain, applied in order")
+    parser.add_argument("--threshold1", type=int, default=DEFAULT_PARAMS["threshold1"])
+    parser.add_argument("--threshold2", type=int, default=DEFAULT_PARAMS["threshold2"])
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-frames", type=int, default=DEFAULT_CHUNK_FRAMES, help="frames per work item")
+    args = parser.parse_args()
+
+    params = {"threshold1": args.threshold1, "threshold2": args.threshold2}
+    try:
+        report = process_video(args.input, args.output, args.filters, params, args.workers, args.chunk_frames)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"{report['frames']} frames in {report['seconds']:.1f}s with {report['workers']} workers: "
+          f"{report['fps']:.1f} fps, {report['megapixels_per_second']:.1f} MP/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
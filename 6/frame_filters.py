@@ -0,0 +1,55 @@
+"""Composable OpenCV filter chains for the webcam app.
+
+A chain applies named filters in order. Every step writes into an output
+buffer owned by the chain, allocated on the first frame and reused until
+the frame size changes, so steady-state processing allocates no new frame
+arrays. Frames stay in BGR or single-channel form throughout; converting
+for display is left to the encoder.
+"""
+import cv2
+import numpy as np
+
+BLUR_KERNEL = (15, 15)
+DEFAULT_PARAMS = {"threshold1": 100, "threshold2": 150}
+
+def new_filter_chain(names):
+    unknown = [name for name in names if name not in FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(unknown)}")
+    return {"names": list(names), "buffers": {}}
+
+# Output buffer for one step, reallocated only when the shape changes
+def stage_buffer(chain, step, shape, dtype=np.uint8):
+    buffer = chain["buffers"].get(step)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = np.empty(shape, dtype=dtype)
+        chain["buffers"][step] = buffer
+    return buffer
+
+def gray_filter(chain, step, frame, params):
+    # Already single-channel (e.g. after Canny): nothing to convert
+    if frame.ndim == 2:
+        return frame
+    dst = stage_buffer(chain, step, frame.shape[:2], frame.dtype)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=dst)
+
+def canny_filter(chain, step, frame, params):
+    dst = stage_buffer(chain, step, frame.shape[:2])
+    return cv2.Canny(frame, params["threshold1"], params["threshold2"], edges=dst)
+
+def blur_filter(chain, step, frame, params):
+    dst = stage_buffer(chain, step, frame.shape, frame.dtype)
+    return cv2.GaussianBlur(frame, BLUR_KERNEL, 0, dst=dst)
+
+FILTERS = {
+    "Gray": gray_filter,
+    "Canny Edge": canny_filter,
+    "Blur": blur_filter,
+}
+
+# The returned frame may be one of the chain's buffers, which the next call
+# overwrites; copy it if it must outlive the next frame
+def run_filter_chain(chain, frame, params=DEFAULT_PARAMS):
+    for step, name in enumerate(chain["names"]):
+        frame = FILTERS[name](chain, step, frame, params)
+    return frame
@@ -0,0 +1,128 @@
+"""Frame sources for the webcam app: webcam, video file, image directory or
+a synthetic generator.
+
+Every source has the cv2.VideoCapture methods the app uses (isOpened, read,
+get, set, release); webcams and video files are plain VideoCapture objects.
+The synthetic source lets the app and the benchmarks run on machines
+without a camera.
+"""
+import os
+
+import cv2
+import numpy as np
+
+SOURCE_KINDS = ["Webcam", "Video file", "Image directory", "Synthetic"]
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+DEFAULT_SOURCE_FPS = 30.0
+
+# Smooth gradients with shapes and mild noise, so Canny finds realistic edges
+def synthetic_frame(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.dstack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                       np.full((height, width), 128, np.float32)]).astype(np.uint8)
+    for _ in range(20):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(frame, center, int(rng.integers(10, height // 4)), color, -1)
+    noise = rng.integers(-8, 9, frame.shape, dtype=np.int16)
+    return np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+class SyntheticSource:
+    def __init__(self, width=640, height=480, fps=DEFAULT_SOURCE_FPS, frame_count=0):
+        self.base = synthetic_frame(width, height)
+        self.fps = fps
+        self.frame_count = frame_count  # 0 = endless
+        self.position = 0
+
+    def isOpened(self):
+        return True
+
+    # The pattern scrolls sideways a little every frame
+    def read(self):
+        if self.frame_count and self.position >= self.frame_count:
+            return False, None
+        shift = (self.position * 4) % self.base.shape[1]
+        self.position += 1
+        return True, np.roll(self.base, shift, axis=1)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            return True
+        return False
+
+    def release(self):
+        pass
+
+class ImageDirectorySource:
+    def __init__(self, path, fps=DEFAULT_SOURCE_FPS, loop=True):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.paths = [os.path.join(path, name) for name in names]
+        self.fps = fps
+        self.loop = loop
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        if self.position >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False, None
+            self.position = 0
+        frame = cv2.imread(self.paths[self.position], cv2.IMREAD_COLOR)
+        self.position += 1
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.paths))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            return True
+        return False
+
+    def release(self):
+        self.paths = []
+
+# `location` is the camera index for webcams and a path for files and
+# directories; `width`/`height` only apply to the synthetic source
+def open_source(kind, location=None, width=640, height=480):
+    if kind == "Webcam":
+        return cv2.VideoCapture(int(location or 0))
+    if kind == "Video file":
+        return cv2.VideoCapture(location)
+    if kind == "Image directory":
+        if not location or not os.path.isdir(location):
+            raise ValueError(f"Not a directory: {location}")
+        return ImageDirectorySource(location)
+    if kind == "Synthetic":
+        return SyntheticSource(width, height)
+    raise ValueError(f"Unknown frame source: {kind}")
+
+def source_fps(source, default=DEFAULT_SOURCE_FPS):
+    fps = source.get(cv2.CAP_PROP_FPS)
+    return fps if fps and fps > 0 else default
+
+# Cameras deliver frames in real time; everything else is read as fast as
+# we ask and has to be paced to play at its own frame rate
+def is_realtime(kind):
+    return kind == "Webcam"